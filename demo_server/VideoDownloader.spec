@@ -5,7 +5,7 @@ a = Analysis(
     ['app.py'],
     pathex=[],
     binaries=[],
-    datas=[('fsmvid.py', '.'), ('douyin_tiktok', 'douyin_tiktok/'), ('youtube', 'youtube/'), ('static', 'static/'), ('bin', 'bin/')],
+    datas=[('fsmvid.py', '.'), ('media_client.py', '.'), ('segmented_download.py', '.'), ('job_store.py', '.'), ('download_engine.py', '.'), ('concurrency.py', '.'), ('rate_limiter.py', '.'), ('resolve_cache.py', '.'), ('quality.py', '.'), ('remux.py', '.'), ('progress_bus.py', '.'), ('event_stream.py', '.'), ('douyin_tiktok', 'douyin_tiktok/'), ('youtube', 'youtube/'), ('static', 'static/'), ('bin', 'bin/')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
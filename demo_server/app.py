@@ -4,21 +4,28 @@ import os
 import re
 from pathlib import Path
 from flask import Flask, request, jsonify, send_from_directory, make_response, stream_with_context, Response
-import httpx
-from fsmvid import FSMVIDDown
+from fsmvid import CookieRefresher, FSMVIDDown, FSMVID_RESOLVE_CONCURRENCY
+from resolve_cache import ResolveCache
+from quality import QualityPolicy
+from media_client import MediaClient
+from segmented_download import SegmentedDownloader
+from remux import RemuxPool
+from progress_bus import ItemProgress, ProgressBus
+from event_stream import EventStream
+from job_store import JobStore
+from download_engine import DownloadEngine
+from concurrency import AdaptiveLimiter, ADAPTIVE_MAX_CONCURRENCY, is_throttle_error
 import webbrowser
 import subprocess
 import threading
-import aiofiles
+import functools
+from concurrent.futures import ThreadPoolExecutor
 import requests
 import uuid
 from douyin_tiktok.douyin_tiktok import DouyinTiktokScraper
-from youtube import YouTubeDownloader
+from youtube import YouTubeDownloader, YTDLP_ERROR_PREFIX
 from flask_cors import CORS
-from queue import Queue
 import json
-import time
-import random
 from datetime import datetime
 
 
@@ -40,15 +47,61 @@ def index():
 # Create media_download folder if it doesn't exist
 DOWNLOAD_FOLDER = Path("media_download")
 DOWNLOAD_FOLDER.mkdir(exist_ok=True)
+# Internal state (job store, resolve cache, FSMVID cookies and browser profile)
+# lives in a per-user app-data folder, away from the downloaded videos.
+# VIDEO_DOWNLOADER_DATA overrides the location.
+APP_NAME = "VideoDownloader"
+if os.environ.get("VIDEO_DOWNLOADER_DATA"):
+    APP_DATA_DIR = Path(os.environ["VIDEO_DOWNLOADER_DATA"])
+elif os.name == 'nt':
+    APP_DATA_DIR = Path(os.environ.get("LOCALAPPDATA") or os.environ.get("APPDATA") or Path.home()) / APP_NAME
+else:
+    APP_DATA_DIR = Path(os.environ.get("XDG_STATE_HOME") or Path.home() / ".local" / "state") / APP_NAME
+APP_DATA_DIR.mkdir(parents=True, exist_ok=True)
 FFMPEG_PATH = os.path.join(sys._MEIPASS if getattr(sys, 'frozen', False) else os.path.dirname(os.path.abspath(__file__)), "bin", "ffmpeg.exe")
 
+# FSMVID resolutions are cached in memory and on disk across restarts
+RESOLVE_CACHE_DIR = APP_DATA_DIR / "resolve_cache"
+FSMVIDDown.resolve_cache = ResolveCache(cache_dir=RESOLVE_CACHE_DIR)
+# FSMVID cookies are renewed in the background and persisted across restarts
+FSMVIDDown.cookie_refresher = CookieRefresher(
+    cookie_file=APP_DATA_DIR / "fsmvid_cookies.json",
+    user_data_dir=APP_DATA_DIR / "fsmvid_profile",
+)
+
 # Global state for download tracking
-download_tasks = {}  # {download_id: {status, videos, progress}}
-download_queues = {}  # {download_id: Queue for SSE events}
-playlist_session = []
-download_stopped = threading.Event()
-download_stopped.set()
-cancel_requested = threading.Event() # New event for cancellation request
+# Batches and per-item results persist across restarts in SQLite
+JOB_STORE_PATH = APP_DATA_DIR / "jobs.sqlite3"
+job_store = JobStore(JOB_STORE_PATH)
+job_store.mark_interrupted()
+# Progress events per batch, shared by every SSE subscriber: {download_id: EventStream}
+download_streams = {}
+# Finished batches whose event buffers stay in memory for late subscribers
+FINISHED_STREAMS_KEPT = 64
+playlist_session = {}
+# Running batches: {download_id: {'cancel': threading.Event, 'task': asyncio.Task}}
+download_runs = {}
+download_runs_lock = threading.Lock()
+# Every batch runs on this one background loop, sharing its connection pool
+# and its global limit on items downloading at once
+download_engine = DownloadEngine()
+download_engine.start()
+# Resolved items waiting for a transfer slot, per batch
+RESOLVED_QUEUE_SIZE = 16
+# ffmpeg merges of separate video/audio streams, shared by every batch
+remux_pool = RemuxPool(FFMPEG_PATH)
+# yt-dlp blocks a thread per download, so it gets its own bounded pool
+YTDLP_WORKERS = 4
+ytdlp_executor = ThreadPoolExecutor(max_workers=YTDLP_WORKERS, thread_name_prefix="yt-dlp")
+# Taken (on the engine loop) before a yt-dlp job is handed to the executor
+ytdlp_slots = asyncio.Semaphore(YTDLP_WORKERS)
+# Byte counters of running batches, published as one snapshot per batch every 250 ms
+progress_bus = ProgressBus(lambda download_id, event: emit_progress(download_id, event))
+download_engine.submit(progress_bus.run())
+# Rows per NDJSON line when listing videos; a request may ask for another size
+# ("chunk_size") up to the maximum
+LISTING_CHUNK_SIZE = 20
+LISTING_CHUNK_MAX = 500
 
 def sanitize_filename(filename: str) -> str:
     """Sanitize filename to remove invalid characters."""
@@ -116,16 +169,33 @@ def classify_urls(urls: list) -> list:
     return result_groups
 
 
-async def download_single_video(item, index: int) -> dict:
-    """Download a single video from URL."""
+def item_policy(item) -> QualityPolicy:
+    """Stream selection for an item from its batch's quality/audio-only options"""
+    return QualityPolicy.from_label(item.get('quality'), audio_only=item.get('audio_only', False))
+
+
+def ytdlp_progress_hook(progress: ItemProgress):
+    """yt-dlp progress hook feeding an item's byte counters"""
+    # yt-dlp counts each file (video, audio) from zero; sum them per item
+    files = {}
+    def hook(d):
+        files[d.get('filename')] = (
+            d.get('downloaded_bytes') or 0,
+            d.get('total_bytes') or d.get('total_bytes_estimate') or 0,
+        )
+        progress.set(sum(done for done, _ in files.values()), sum(total for _, total in files.values()))
+    return hook
+
+
+async def download_single_video(item, index: int, client: MediaClient, resolved: dict = None, progress: ItemProgress = None) -> dict:
+    """Download a single video from URL using the batch's pooled media client.
+
+    ``resolved`` is the item's FSMVID result when the caller resolved it
+    already; otherwise it is resolved here. ``progress`` receives the item's
+    byte counts. Stopping a batch cancels the task running this coroutine, so
+    ``asyncio.CancelledError`` propagates out of any in-flight transfer.
+    """
     try:
-        resp_cancel = {
-            "url": item['url'],
-            "status": "Cancelled",
-            "message": "cancel download"
-        }
-        if cancel_requested.is_set():
-            return resp_cancel
         url = item['url']
         platform = item['platform']
         if not platform:
@@ -136,11 +206,27 @@ async def download_single_video(item, index: int) -> dict:
             }
 
         if platform == "youtube":
-            # Wrap sync YouTube downloader in async to prevent blocking
-            if cancel_requested.is_set():
-                return resp_cancel
+            # yt-dlp blocks, so it runs on its own executor; setting ``stop``
+            # makes its progress hook abort the download
             downloader = YouTubeDownloader(url, item['save_path'], 0, ffmpeg_path=FFMPEG_PATH)
-            await asyncio.to_thread(downloader.download_worker, url)
+            policy = item_policy(item)
+            stop = threading.Event()
+            worker = functools.partial(
+                downloader.download_worker, url, policy.max_height, policy.audio_only,
+                output_dir=item['save_path'], cancel_event=stop,
+                on_progress=ytdlp_progress_hook(progress) if progress is not None else None,
+            )
+            try:
+                outcome = await asyncio.get_running_loop().run_in_executor(ytdlp_executor, worker)
+            except asyncio.CancelledError:
+                stop.set()
+                raise
+            if outcome.startswith(YTDLP_ERROR_PREFIX):
+                return {
+                    "url": url,
+                    "status": "error",
+                    "message": outcome.split(" -> ", 1)[-1]
+                }
             return {
                 "url": url,
                 "status": "success",
@@ -148,8 +234,9 @@ async def download_single_video(item, index: int) -> dict:
                 "title": "",
                 "duration": ""
             }
-        fsmvid = FSMVIDDown()
-        result = await fsmvid.download(platform, url)
+        if resolved is None:
+            resolved = await FSMVIDDown().download(platform, url, policy=item_policy(item))
+        result = resolved
         
         if not result or result.get("status", "") != "success" or result.get("cnt", 0) == 0:
             return {
@@ -160,9 +247,6 @@ async def download_single_video(item, index: int) -> dict:
         
         cnt = result.get("cnt", 0)
         medias = result.get("medias", [])
-        
-        if cancel_requested.is_set():
-            return resp_cancel
 
         if not medias:
             return {
@@ -172,6 +256,7 @@ async def download_single_video(item, index: int) -> dict:
             }
         video_id = result.get("id", uuid.uuid4())
         title = result.get("title", "video")
+        downloader = SegmentedDownloader(client, progress=progress)
         if cnt == 1:
             video_media = medias[0]
             video_url = video_media.get("url")
@@ -187,32 +272,18 @@ async def download_single_video(item, index: int) -> dict:
                 extension = video_media.get("extension", "jpg")
                 filename = f"{sanitize_filename(video_id)}.{extension}"
                 filepath = Path(item['save_path']) / filename
-                async with httpx.AsyncClient(timeout=None, follow_redirects=True) as client:
-                    async with client.stream("GET", video_url) as response:
-                        response.raise_for_status()
-                        with open(filepath, "wb") as f:
-                            async for chunk in response.aiter_bytes(chunk_size=1024*1024): 
-                                if cancel_requested.is_set():
-                                    return resp_cancel
-                                f.write(chunk)
+                await downloader.download(video_url, filepath)
                 return {
                     "url": url,
                     "status": "success",
                     "filename": filename,
                     "title": title
                 }
-            ext = video_media.get("ext", "mp4")
+            # Audio-only batches get the audio stream alone
+            ext = video_media.get("ext", "mp3" if type == "audio" else "mp4")
             filename = f"{sanitize_filename(video_id)}.{ext}"
             filepath = Path(item['save_path']) / filename
-            async with httpx.AsyncClient(timeout=None, follow_redirects=True) as client:
-                async with client.stream("GET", video_url) as response:
-                    response.raise_for_status()
-
-                    async with aiofiles.open(filepath, "wb") as f:
-                        async for chunk in response.aiter_bytes(chunk_size=4 * 1024 * 1024):  # 4MB
-                            if cancel_requested.is_set():
-                                return resp_cancel
-                            await f.write(chunk)
+            await downloader.download(video_url, filepath)
             return {
                 "url": url,
                 "status": "success",
@@ -225,99 +296,246 @@ async def download_single_video(item, index: int) -> dict:
             
             video_url = video_media.get("url")
             ext = video_media.get("ext", "mp4")
-            filename = f"{sanitize_filename(video_id)}.{ext}"
-            filepath = Path(item['save_path']) / filename
-            async with httpx.AsyncClient(timeout=None, follow_redirects=True, http2=True) as client:
-                async with client.stream("GET", video_url) as response:
-                    response.raise_for_status()
-
-                    async with aiofiles.open(filepath, "wb") as f:
-                        async for chunk in response.aiter_bytes(chunk_size=4 * 1024 * 1024):  # 4MB
-                            if cancel_requested.is_set():
-                                return resp_cancel
-                            await f.write(chunk)
             audio_media = medias[1]
             audio_url = audio_media.get("url")
             audio_ext = audio_media.get("ext", "mp3")
-            audio_filename = f"{sanitize_filename(video_id)}.{audio_ext}"
-            audio_filepath = Path(item['save_path']) / audio_filename
-            async with httpx.AsyncClient(timeout=None, follow_redirects=True, http2=True) as client:
-                async with client.stream("GET", audio_url) as response:
-                    response.raise_for_status()
-
-                    async with aiofiles.open(audio_filepath, "wb") as f:
-                        async for chunk in response.aiter_bytes(chunk_size=4 * 1024 * 1024):  # 4MB
-                            if cancel_requested.is_set():
-                                return resp_cancel
-                            await f.write(chunk)
-
+            if remux_pool.available:
+                # Streams are merged into <id>.mp4 afterwards
+                filename = f"{sanitize_filename(video_id)}.mp4"
+                filepath = Path(item['save_path']) / f"{sanitize_filename(video_id)}.video.{ext}"
+                audio_filepath = Path(item['save_path']) / f"{sanitize_filename(video_id)}.audio.{audio_ext}"
+            else:
+                filename = f"{sanitize_filename(video_id)}.{ext}"
+                filepath = Path(item['save_path']) / filename
+                audio_filename = f"{sanitize_filename(video_id)}.{audio_ext}"
+                audio_filepath = Path(item['save_path']) / audio_filename
+
+            # Fetch video and audio streams concurrently
+            fetches = [
+                asyncio.ensure_future(downloader.download(video_url, filepath)),
+                asyncio.ensure_future(downloader.download(audio_url, audio_filepath)),
+            ]
+            try:
+                await asyncio.gather(*fetches)
+            except BaseException:
+                for fetch in fetches:
+                    fetch.cancel()
+                raise
 
-            return {
+            result = {
                 "url": url,
                 "status": "success",
                 "filename": filename,
                 "title": title,
                 "duration": ""
             }
+            if remux_pool.available:
+                # Merging is left to the batch's post-processing stage
+                result["remux"] = (filepath, audio_filepath, Path(item['save_path']) / filename)
+            return result
     except Exception as e:
         return {
             "url": url,
             "status": "error",
-            "message": str(e)
+            "message": str(e),
+            "throttled": is_throttle_error(e)
         }
 
-async def download_multiple_videos(download_id: str, items: list, concurrent_downloads: int) -> list:
-    """Download multiple videos in parallel with concurrency limit."""
+async def download_multiple_videos(download_id: str, items: list, concurrent_downloads: int, adaptive: bool = False) -> dict:
+    """Download multiple videos in parallel as a resolve -> transfer pipeline.
+
+    A resolver task resolves FSMVID items through ``FSMVIDDown.download_many``
+    (its own concurrency, backing off when throttled) and feeds them into a
+    bounded queue; YouTube items go in alongside since yt-dlp resolves as it
+    downloads. Throttled resolutions also shrink the transfer limit. Transfer
+    workers drain the queue, so bytes keep moving while later items wait on
+    the API, and the queue bound keeps resolution only a few items ahead.
+
+    The transfer limit is ``concurrent_downloads``, or with ``adaptive`` it
+    starts there and an ``AdaptiveLimiter`` grows/shrinks it with throughput
+    and throttling. Each transfer also takes one of the engine's global slots
+    and streams through the engine's shared client. Items whose video and
+    audio arrive separately are then merged by ``remux_pool`` after their
+    transfer slot is released. Results go to the job store and the progress
+    queue as they finish; the batch summary is returned.
+    """
+    client = download_engine.client
+    if adaptive:
+        limiter = AdaptiveLimiter(concurrent_downloads, max_limit=max(concurrent_downloads, ADAPTIVE_MAX_CONCURRENCY))
+    else:
+        limiter = AdaptiveLimiter(concurrent_downloads, min_limit=concurrent_downloads, max_limit=concurrent_downloads)
+    # (idx, item, FSMVID result or None); None marks the end of the batch
+    resolved_queue = asyncio.Queue(maxsize=RESOLVED_QUEUE_SIZE)
+    # FSMVID resolutions in flight: FSMVID_RESOLVE_CONCURRENCY, halved on throttling
+    resolve_limiter = AdaptiveLimiter(FSMVID_RESOLVE_CONCURRENCY, max_limit=FSMVID_RESOLVE_CONCURRENCY)
+    recorded = set()
+    # Items put into ``resolved_queue`` (their transfer records the result)
+    handed_off = set()
+    batch_progress = progress_bus.open(download_id, len(items))
+    # Running merges (post-processing stage)
+    postprocessing = set()
     
-    # Tạo semaphore để giới hạn concurrent downloads
-    semaphore = asyncio.Semaphore(concurrent_downloads)
-    
-    async def download_with_limit(item, idx):
-        """Wrapper function that respects semaphore limit"""
-        if cancel_requested.is_set():
-             return {
-                "url": item['url'],
-                "status": "Cancelled",
-                "message": "cancel download"
-            }
-        async with semaphore:  # Chỉ cho phép N tasks vào đây cùng lúc
-            try:
-                result = await download_single_video(item, idx)
-                
-                # Update progress
-                download_tasks[download_id]['completed'] += 1
-                download_tasks[download_id]['videos'][item['url']] = result
-                
-                print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] [PROGRESS] Video {download_tasks[download_id]['completed']}/{download_tasks[download_id]['total']}: {item['url']} - {result['status']}")
-                
-                emit_progress(download_id, {
-                    'type': 'progress',
+    def record_result(idx, item, result):
+        recorded.add(idx)
+        batch_progress.finish(item['url'])
+        # Update progress
+        batch = job_store.record_result(download_id, item['url'], result)
+        
+        print(f"[{datetime.now().strftime('%H:%M:%S.%f')[:-3]}] [PROGRESS] Video {batch['completed']}/{batch['total']}: {item['url']} - {result['status']}")
+        
+        emit_progress(download_id, {
+            'type': 'progress',
+            'url': item['url'],
+            'status': result['status'],
+            'message': result.get('message', ''),
+            'filename': result.get('filename', ''),
+            'completed': batch['completed'],
+            'total': batch['total'],
+            'concurrency': limiter.limit
+        })
+
+    def error_result(item, e):
+        return {
+            'url': item.get('url', ''),
+            'status': 'error',
+            'message': str(e),
+            'throttled': is_throttle_error(e)
+        }
+
+    async def hand_off(idx, item, resolved):
+        await resolved_queue.put((idx, item, resolved))
+        handed_off.add(idx)
+
+    async def feed_youtube(jobs):
+        # yt-dlp resolves as it downloads, so these go straight to the transfer stage
+        for idx, item in jobs:
+            await hand_off(idx, item, None)
+
+    async def resolve_fsmvid(jobs):
+        if not jobs:
+            return
+        pairs = [(item['platform'], item['url']) for _, item in jobs]
+        # Quality is chosen per batch, so every item shares one policy
+        policy = item_policy(jobs[0][1])
+        try:
+            async for n, result in FSMVIDDown().download_many(pairs, policy=policy, limiter=resolve_limiter):
+                idx, item = jobs[n]
+                if isinstance(result, Exception):
+                    if is_throttle_error(result):
+                        limiter.on_throttle()
+                    record_result(idx, item, error_result(item, result))
+                else:
+                    await hand_off(idx, item, result)
+        except Exception as e:
+            # Resolver broke down: fail what it never handed off, keep the rest going
+            for idx, item in jobs:
+                if idx not in recorded and idx not in handed_off:
+                    record_result(idx, item, error_result(item, e))
+
+    async def resolve_all():
+        """Resolve stage: feed transfer-ready items into ``resolved_queue``"""
+        youtube_jobs, fsmvid_jobs = [], []
+        for idx, item in enumerate(items):
+            if not item.get('platform'):
+                record_result(idx, item, {
                     'url': item['url'],
-                    'status': result['status'],
-                    'message': result.get('message', ''),
-                    'filename': result.get('filename', ''),
-                    'completed': download_tasks[download_id]['completed'],
-                    'total': download_tasks[download_id]['total']
-                })
-                
-                return result
-            except Exception as e:
-                return {
-                    'url': item.get('url', ''),
                     'status': 'error',
-                    'message': str(e)
-                }
-    
-    tasks = [download_with_limit(item, i) for i, item in enumerate(items)]
-    results = await asyncio.gather(*tasks, return_exceptions=True)
-    download_tasks[download_id]['status'] = 'completed'
+                    'message': 'not support this platform'
+                })
+            elif item['platform'] == 'youtube':
+                youtube_jobs.append((idx, item))
+            else:
+                fsmvid_jobs.append((idx, item))
+        # Both kinds feed the queue side by side, so FSMVID resolution runs
+        # ahead while YouTube items wait for transfer slots, and vice versa
+        await asyncio.gather(feed_youtube(youtube_jobs), resolve_fsmvid(fsmvid_jobs))
+        await resolved_queue.put(None)
+
+    async def transfer(idx, item, resolved):
+        """Transfer stage: download one item inside a global slot and record its result"""
+        try:
+            if item['platform'] == 'youtube':
+                # Wait for a yt-dlp thread first, so queued yt-dlp jobs don't
+                # hold global slots other batches' transfers could use
+                async with ytdlp_slots, download_engine.global_slots:
+                    result = await download_single_video(item, idx, client, resolved, batch_progress.item(item['url']))
+            else:
+                async with download_engine.global_slots:
+                    result = await download_single_video(item, idx, client, resolved, batch_progress.item(item['url']))
+        except Exception as e:
+            result = error_result(item, e)
+        if result.get('throttled'):
+            limiter.on_throttle()
+        elif result['status'] == 'success':
+            limiter.on_success()
+        remux_job = result.pop('remux', None)
+        if remux_job is None:
+            record_result(idx, item, result)
+            return
+        task = asyncio.ensure_future(postprocess(idx, item, result, remux_job))
+        postprocessing.add(task)
+        task.add_done_callback(postprocessing.discard)
+
+    async def postprocess(idx, item, result, remux_job):
+        """Post-processing stage: merge video + audio into one mp4 and record the result"""
+        emit_progress(download_id, {
+            'type': 'postprocess',
+            'url': item['url'],
+            'status': 'started',
+            'filename': result.get('filename', '')
+        })
+        try:
+            await remux_pool.remux(*remux_job)
+        except Exception as e:
+            result = dict(result, status='error', message=f"merge failed: {e}")
+        record_result(idx, item, result)
+
+    async def worker():
+        # Workers share ``resolved_queue``, so each item is taken exactly once,
+        # and only after the limiter has a free slot
+        while True:
+            async with limiter:
+                job = await resolved_queue.get()
+                if job is None:
+                    # Pass the end marker on to the next worker
+                    resolved_queue.put_nowait(None)
+                    return
+                await transfer(*job)
+
+    resolver = asyncio.ensure_future(resolve_all())
+    workers = [asyncio.ensure_future(worker()) for _ in range(max(1, min(limiter.max_limit, len(items))))]
+    status = 'completed'
+    try:
+        await asyncio.gather(resolver, *workers)
+        # Merges still running after the last transfer
+        while postprocessing:
+            await asyncio.gather(*postprocessing)
+    except asyncio.CancelledError:
+        # Batch stopped: every item without a result yet is recorded as cancelled
+        resolver.cancel()
+        for task in postprocessing:
+            task.cancel()
+        await asyncio.gather(resolver, *workers, *postprocessing, return_exceptions=True)
+        for idx, item in enumerate(items):
+            if idx not in recorded:
+                record_result(idx, item, {
+                    'url': item['url'],
+                    'status': 'Cancelled',
+                    'message': 'cancel download'
+                })
+        status = 'cancelled'
+    finally:
+        progress_bus.close(download_id)
+    job_store.finish_batch(download_id, status)
+    batch = job_store.get_batch(download_id)
     emit_progress(download_id, {
         'type': 'completed',
-        'total': download_tasks[download_id]['total'],
-        'completed': download_tasks[download_id]['completed']
+        'status': status,
+        'total': batch['total'],
+        'completed': batch['completed']
     })
     
-    return list(results)
+    return batch
 
 
 @app.route('/api/choose-directory', methods=['GET', 'POST', 'OPTIONS'])
@@ -360,63 +578,41 @@ def choose_directory():
         return response, 500
 
 
-@app.route('/api/load_videos_by_user', methods=['POST'])
-def load_videos_by_user():
-    def load_video_data():
-        global playlist_session
-        playlist_session = {}
-        data = request.get_json()
-        user_url = data.get('channel_url', '')
-        platform = data.get('platform', '')
-        if not user_url:
-            error_message = {
-            	"error": True,
-            	"message": "Empty input",
-            	"status": 400
-            }
-            yield json.dumps(error_message, ensure_ascii=False) + "\n"
-            return
+def listing_chunk_size(data):
+    """Rows per NDJSON line requested by the client, clamped to [1, LISTING_CHUNK_MAX]"""
+    try:
+        size = int(data.get('chunk_size') or LISTING_CHUNK_SIZE)
+    except (TypeError, ValueError):
+        size = LISTING_CHUNK_SIZE
+    return min(max(size, 1), LISTING_CHUNK_MAX)
 
-        # group_urls = classify_urls([user_url])
-        # group = group_urls[0]
-        # temp = group[0]
-        items = []
-        # if temp['type'] == 'channel':
-        #     if temp['platform'] == "tiktok" or temp['platform'] == "douyin":
-        #         scraper = DouyinTiktokScraper()
-        #         if temp['platform'] == "douyin":
-        #             items = asyncio.run(scraper.douyin_fetch_user_post_videos(sec_user_id=temp['sec_user_id'], max_cursor=0, count=50))  
-        #         elif temp['platform'] == "tiktok":
-        #             items = asyncio.run(scraper.tiktok_fetch_user_post_videos(temp['url']))
-        #     elif temp['platform'] == "youtube":
-        #         items = YouTubeDownloader(temp['url'], "", 0, FFMPEG_PATH).get_channel_videos()
-        if platform == "tiktok" or platform == "douyin":
-            scraper = DouyinTiktokScraper()
-            if platform == "douyin":
-                group_urls = classify_urls([user_url])
-                group = group_urls[0]
-                temp = group[0]
-                items = asyncio.run(scraper.douyin_fetch_user_post_videos(sec_user_id=temp['sec_user_id'], max_cursor=0, count=50))  
-            elif platform == "tiktok":
-                items = asyncio.run(scraper.tiktok_fetch_user_post_videos(user_url))
-        elif platform == "youtube":
-            items = YouTubeDownloader(user_url, "", 0, FFMPEG_PATH).get_channel_videos()
-        if not items:
-            error_message = {
-             "error": True,
-             "message": "Không tìm thấy video",
-             "status": 400
-            }
-            yield json.dumps(error_message, ensure_ascii=False) + "\n"
-            return
-        i = 1
+
+async def user_video_lines(data):
+    """NDJSON lines listing a channel's videos (shared by the WSGI and ASGI routes)"""
+    global playlist_session
+    playlist_session = {}
+    user_url = data.get('channel_url', '')
+    platform = data.get('platform', '')
+    if not user_url:
+        error_message = {
+        	"error": True,
+        	"message": "Empty input",
+        	"status": 400
+        }
+        yield json.dumps(error_message, ensure_ascii=False) + "\n"
+        return
+
+    chunk_size = listing_chunk_size(data)
+    i = 1
+    check_duplicate = set()
+    # Pages are paced by the crawler's rate limiter; rows already fetched go out at once
+    async for page in channel_pages(platform, user_url):
         temp1 = []
-        check_duplicate = []
-        for item in items:
+        for item in page:
             url = item['url']
             if url in check_duplicate:
                 continue
-            check_duplicate.append(url)
+            check_duplicate.add(url)
             video_data = {
                 "id": i,
                 "url": item['url'],
@@ -429,20 +625,60 @@ def load_videos_by_user():
                 "status": "Sẵn sàng",
             }
             temp1.append(video_data)
-            video_data['platform'] = temp['platform']
+            video_data['platform'] = platform
             video_data['type'] = 'video'
             playlist_session[url] = video_data  # Store each video in session
-            
-            if i % 20 == 0:
-                delay = max(0.1, random.gauss(1, 0.5))
-                time.sleep(delay)
+
+            if i % chunk_size == 0:
                 yield json.dumps(temp1, ensure_ascii=False) + "\n"
                 temp1 = []
             i += 1
+        # Gửi phần còn lại của trang ngay, không chờ trang tiếp theo
         if temp1:
             yield json.dumps(temp1, ensure_ascii=False) + "\n"
+    if i == 1:
+        error_message = {
+         "error": True,
+         "message": "Không tìm thấy video",
+         "status": 400
+        }
+        yield json.dumps(error_message, ensure_ascii=False) + "\n"
+
+
+async def channel_pages(platform, user_url):
+    """Yield a channel's videos page by page, as the crawler fetches them"""
+    if platform == "douyin":
+        scraper = DouyinTiktokScraper()
+        group_urls = classify_urls([user_url])
+        temp = group_urls[0][0]
+        async for page in scraper.douyin_iter_user_post_pages(sec_user_id=temp['sec_user_id'], max_cursor=0, count=50):
+            yield page
+    elif platform == "tiktok":
+        # yt-dlp liệt kê cả kênh một lần
+        match = re.search(r"tiktok\.com/@([^/?#]+)", user_url)
+        if match:
+            yield await DouyinTiktokScraper().tiktok_fetch_user_post(match.group(1))
+    elif platform == "youtube":
+        # yt-dlp liệt kê cả kênh một lần
+        yield await asyncio.to_thread(YouTubeDownloader(user_url, "", 0, FFMPEG_PATH).get_channel_videos)
+
+
+def iterate_in_engine(agen):
+    """Drive an async generator on the download engine loop from a WSGI response"""
+    try:
+        while True:
+            try:
+                yield download_engine.submit(agen.__anext__()).result()
+            except StopAsyncIteration:
+                return
+    finally:
+        download_engine.submit(agen.aclose()).result()
 
-    return Response(stream_with_context(load_video_data()), mimetype="application/x-ndjson")
+
+@app.route('/api/load_videos_by_user', methods=['POST'])
+def load_videos_by_user():
+    data = request.get_json()
+    return Response(stream_with_context(iterate_in_engine(user_video_lines(data))), mimetype="application/x-ndjson")
 
 @app.route('/api/load_videos_by_list', methods=['POST'])
 def load_videos_by_list():
@@ -452,6 +688,7 @@ def load_videos_by_list():
         
         data = request.get_json()
         text_urls = data.get('urls', '')
+        chunk_size = listing_chunk_size(data)
     
         if not text_urls:
             error_message = {
@@ -488,7 +725,7 @@ def load_videos_by_list():
                 video_data['type'] = item['type']
                 playlist_session[url] = video_data  # Store each video in session
                 
-                if i % 20 == 0:
+                if i % chunk_size == 0:
                     yield json.dumps(temp, ensure_ascii=False) + "\n"
                     temp = []
                 i += 1
@@ -507,33 +744,38 @@ def download_videos():
         save_path = data.get('save_path', str(DOWNLOAD_FOLDER))
         quality = data.get('quality', 'Cao nhất')
         concurrent_downloads = data.get('concurrent_downloads', 5)
+        adaptive_concurrency = bool(data.get('adaptive_concurrency', False))
+        # Chỉ tải âm thanh: audio_only, hoặc tắt video nhưng bật audio
+        audio_only = bool(data.get('audio_only', False)) or (
+            data.get('video_enabled') is False and data.get('audio_enabled', True) is not False
+        )
 
         if not video_urls:
             return jsonify({'error': 'No video URLs provided'}), 400
         
         items=[]
         for i, url in enumerate(video_urls, 1):
-            item = playlist_session[url]
+            item = playlist_session.get(url)
+            if item is None:
+                # Not in the current listing (e.g. after a restart): classify it again
+                item = classify_urls([url])[0][0]
+            # Per-batch copy so concurrent batches don't overwrite each other's options
+            item = dict(item)
             item['save_path'] = save_path
             item['quality'] = quality
+            item['audio_only'] = audio_only
             items.append(item)
 
         download_id = str(uuid.uuid4())
         
-        download_queues[download_id] = Queue()
-        
-        download_tasks[download_id] = {
-            'status': 'started',
-            'total': len(video_urls),
-            'completed': 0,
-            'videos': {}
-        }
-        thread = threading.Thread(
-            target=run_async_downloads,
-            args=(download_id, items, concurrent_downloads)
-        )
-        thread.daemon = True
-        thread.start()
+        for expired_id in job_store.evict_expired():
+            download_streams.pop(expired_id, None)
+        prune_download_streams()
+        download_streams[download_id] = EventStream()
+        job_store.create_batch(download_id, [item['url'] for item in items])
+        with download_runs_lock:
+            download_runs[download_id] = {'cancel': threading.Event(), 'task': None}
+        download_engine.submit(run_async_downloads(download_id, items, concurrent_downloads, adaptive_concurrency))
 
         
         return jsonify({
@@ -546,56 +788,157 @@ def download_videos():
         return jsonify({'error': str(e)}), 500
 
 
+# Most events sent in one SSE write
+SSE_MAX_BATCH = 256
+
+
 def emit_progress(download_id, data):
-    """Emit progress event to SSE queue"""
-    if download_id in download_queues:
-        download_queues[download_id].put(data)
-
-def run_async_downloads(download_id, items, concurrent_downloads):
-    """Wrapper to run async downloads in background thread"""
-    download_stopped.clear()
-    cancel_requested.clear()
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+    """Publish a progress event to the batch's SSE subscribers"""
+    stream = download_streams.get(download_id)
+    if stream is not None:
+        stream.publish(data)
+
+def prune_download_streams():
+    """Drop event buffers of the oldest finished batches (the job store can still replay them)"""
+    finished = [download_id for download_id, stream in list(download_streams.items()) if stream.closed]
+    for download_id in finished[:-FINISHED_STREAMS_KEPT]:
+        download_streams.pop(download_id, None)
+
+def cancel_download(download_id) -> bool:
+    """Cancel one running batch without waiting for it. Return False if it is not running."""
+    with download_runs_lock:
+        run = download_runs.get(download_id)
+        if run is None:
+            return False
+        run['cancel'].set()
+        if run['task'] is not None:
+            download_engine.call_soon(run['task'].cancel)
+    return True
+
+async def run_async_downloads(download_id, items, concurrent_downloads, adaptive=False):
+    """Run one batch on the shared download engine loop"""
+    task = asyncio.current_task()
+    with download_runs_lock:
+        run = download_runs.setdefault(download_id, {'cancel': threading.Event()})
+        run['task'] = task
+        if run['cancel'].is_set():
+            task.cancel()
     
     try:
         emit_progress(download_id, {
             'type': 'started',
             'total': len(items)
         })
-        loop.run_until_complete(
-            download_multiple_videos(download_id, items, concurrent_downloads)
-        )
+        await download_multiple_videos(download_id, items, concurrent_downloads, adaptive)
+    except asyncio.CancelledError:
+        # Stopped before the batch got to run
+        job_store.finish_batch(download_id, 'cancelled')
+        batch = job_store.get_batch(download_id)
+        emit_progress(download_id, {
+            'type': 'completed',
+            'status': 'cancelled',
+            'total': batch['total'],
+            'completed': batch['completed']
+        })
     except Exception as e:
         print(f"Error in run_async_downloads: {e}")
+        job_store.finish_batch(download_id, 'error')
         emit_progress(download_id, {
             'type': 'error',
             'error': str(e)
         })
     finally:
-        loop.close()
-        download_stopped.set()
+        with download_runs_lock:
+            download_runs.pop(download_id, None)
+
+def last_event_id(header, query) -> int:
+    """Id the subscriber has already seen (SSE ``Last-Event-ID`` header or ``?last_event_id=``)"""
+    value = header or query or '0'
+    return int(value) if value.isdigit() else 0
+
+
+def progress_prelude(download_id, after_id):
+    """Start a progress subscription.
+
+    Returns ``(stream, lines, last_id)``: the live ``EventStream`` (None if the
+    batch has none any more), SSE lines to send first, and the id to read on
+    from. Shared by the WSGI and ASGI progress routes.
+    """
+    def replay_from_store(batch, results, skip=()):
+        completed = 0
+        for result in results:
+            if result['url'] in skip:
+                continue
+            completed += 1
+            event = {
+                'type': 'progress',
+                'url': result['url'],
+                'status': result['status'],
+                'message': result.get('message', ''),
+                'filename': result.get('filename', ''),
+                'completed': completed,
+                'total': batch['total']
+            }
+            yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+    stream = download_streams.get(download_id)
+    if stream is None:
+        batch = job_store.get_batch(download_id)
+        if batch is None:
+            return None, [f"data: {json.dumps({'error': 'Invalid download_id'})}\n\n"], after_id
+        # No live stream (finished long ago or server restarted): replay from the job store
+        lines = list(replay_from_store(batch, job_store.get_items(download_id)))
+        if batch['status'] in ('completed', 'cancelled'):
+            event = {'type': 'completed', 'status': batch['status'], 'total': batch['total'], 'completed': batch['completed']}
+        else:
+            event = {'type': 'error', 'error': f"Download {batch['status']}", 'total': batch['total'], 'completed': batch['completed']}
+        lines.append(f"data: {json.dumps(event, ensure_ascii=False)}\n\n")
+        return None, lines, after_id
+
+    lines = []
+    if after_id + 1 < stream.first_id:
+        # Missed events already left the buffer: catch up on item results from
+        # the store, except those still buffered (they follow from ``after_id``).
+        # The store is read first, so an item finishing meanwhile is in the buffer.
+        batch = job_store.get_batch(download_id)
+        results = job_store.get_items(download_id)
+        after_id = stream.first_id - 1
+        buffered = {event.get('url') for _, event in stream.read(after_id, timeout=0) if event.get('type') == 'progress'}
+        if batch is not None:
+            lines = list(replay_from_store(batch, results, skip=buffered))
+    return stream, lines, after_id
+
+
+def format_events(events) -> str:
+    """Serialise ``(id, event)`` pairs as one SSE chunk"""
+    return "".join(f"id: {event_id}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n" for event_id, event in events)
+
 
 @app.route('/api/download_progress/<download_id>', methods=['GET'])
 def download_progress(download_id):
-    """Stream download progress via Server-Sent Events"""
+    """Stream download progress via Server-Sent Events.
+
+    Any number of clients can subscribe; each event carries an ``id`` and a
+    reconnecting client's ``Last-Event-ID`` (or ``?last_event_id=``) resumes
+    right after it.
+    """
+    stream, lines, last_id = progress_prelude(
+        download_id, last_event_id(request.headers.get('Last-Event-ID'), request.args.get('last_event_id'))
+    )
+
     def generate():
-        if download_id not in download_queues:
-            yield f"data: {json.dumps({'error': 'Invalid download_id'})}\n\n"
+        yield from lines
+        if stream is None:
             return
-        
-        queue = download_queues[download_id]
-        
-        while True:
-            try:
-                event = queue.get(timeout=30)
-                yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
-                if event.get('type') in ['completed', 'error']:
-                    if download_id in download_queues:
-                        del download_queues[download_id]
-                    break
-            except:
+        after_id = last_id
+        while not stream.finished(after_id):
+            events = stream.read(after_id, timeout=30, limit=SSE_MAX_BATCH)
+            if not events:
                 yield f": keepalive\n\n"
+                continue
+            # Send everything already published in one write
+            yield format_events(events)
+            after_id = events[-1][0]
     
     return Response(
         stream_with_context(generate()),
@@ -607,15 +950,23 @@ def download_progress(download_id):
         }
     )
 
+@app.route('/api/download/<download_id>/stop', methods=['POST'])
+def api_download_stop_batch(download_id):
+    """Cancel one batch; progress events report the cancelled items."""
+    if not cancel_download(download_id):
+        return jsonify({'error': 'Invalid download_id'}), 404
+    return jsonify({'message': 'Stop command received', 'download_id': download_id})
+
 @app.route('/api/download/stop', methods=['POST'])
 def api_download_stop():
-    """Handle stop download request from frontend."""
+    """Handle stop download request from frontend: cancel every running batch."""
     try:
-        print("Waiting for downloads to stop...")
-        cancel_requested.set()
-        download_stopped.wait()
-        print("Downloads stopped.")
-        response = jsonify({'message': 'Stop command received'})
+        with download_runs_lock:
+            running = list(download_runs)
+        for download_id in running:
+            cancel_download(download_id)
+        print(f"Stop requested for {len(running)} download(s).")
+        response = jsonify({'message': 'Stop command received', 'download_ids': running})
         return response
     except Exception as e:
         print(f"Error in api_download_stop: {e}")
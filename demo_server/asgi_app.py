@@ -0,0 +1,138 @@
+"""ASGI serving mode.
+
+Serves the same routes as ``app.py``, but the streaming endpoints run as
+coroutines on the server's event loop, so each progress subscriber or channel
+listing costs a task instead of a worker thread:
+
+- ``GET /api/download_progress/<id>`` (SSE)
+- ``POST /api/load_videos_by_user`` (NDJSON)
+
+Every other route is the Flask app, wrapped with ``asgiref``.
+
+Optional dependencies: ``pip install asgiref uvicorn``, then run
+``python asgi_app.py`` or ``uvicorn asgi_app:application --port 5000``.
+"""
+import asyncio
+import json
+import os
+import sys
+from urllib.parse import parse_qs
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError as e:  # pragma: no cover - optional dependency
+    raise ImportError("ASGI mode needs asgiref (and an ASGI server): pip install asgiref uvicorn") from e
+
+import app as flask_app
+
+PROGRESS_PREFIX = "/api/download_progress/"
+# Seconds without events before an SSE keepalive comment
+SSE_KEEPALIVE = 30
+
+_wsgi = WsgiToAsgi(flask_app.app)
+
+
+async def _start(send, status: int, content_type: str, extra_headers=()):
+    headers = [
+        (b"content-type", content_type.encode()),
+        (b"cache-control", b"no-cache"),
+        (b"access-control-allow-origin", b"*"),
+        *extra_headers,
+    ]
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+
+
+async def _body(send, text: str, more: bool = True):
+    await send({"type": "http.response.body", "body": text.encode("utf-8"), "more_body": more})
+
+
+async def _until_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def _stream_until_disconnect(receive, producer):
+    """Run ``producer`` until it finishes or the client goes away."""
+    task = asyncio.ensure_future(producer)
+    watcher = asyncio.ensure_future(_until_disconnect(receive))
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for pending in (task, watcher):
+            pending.cancel()
+        await asyncio.gather(task, watcher, return_exceptions=True)
+    if task.done() and not task.cancelled() and task.exception() is not None:
+        raise task.exception()
+
+
+async def download_progress(scope, receive, send, download_id: str):
+    header = dict(scope["headers"]).get(b"last-event-id", b"").decode("latin-1")
+    query = parse_qs(scope.get("query_string", b"").decode()).get("last_event_id", [None])[0]
+    stream, lines, last_id = flask_app.progress_prelude(download_id, flask_app.last_event_id(header, query))
+
+    async def produce():
+        await _start(send, 200, "text/event-stream", [(b"x-accel-buffering", b"no")])
+        if lines:
+            await _body(send, "".join(lines))
+        after_id = last_id
+        while stream is not None and not stream.finished(after_id):
+            events = await stream.read_async(after_id, timeout=SSE_KEEPALIVE, limit=flask_app.SSE_MAX_BATCH)
+            if not events:
+                await _body(send, ": keepalive\n\n")
+                continue
+            await _body(send, flask_app.format_events(events))
+            after_id = events[-1][0]
+        await _body(send, "", more=False)
+
+    await _stream_until_disconnect(receive, produce())
+
+
+async def load_videos_by_user(scope, receive, send):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    try:
+        data = json.loads(b"".join(chunks) or b"{}")
+    except ValueError:
+        data = {}
+
+    async def produce():
+        await _start(send, 200, "application/x-ndjson")
+        async for line in flask_app.user_video_lines(data):
+            await _body(send, line)
+        await _body(send, "", more=False)
+
+    await _stream_until_disconnect(receive, produce())
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    if scope["type"] == "http":
+        path, method = scope["path"], scope["method"]
+        if method == "GET" and path.startswith(PROGRESS_PREFIX):
+            return await download_progress(scope, receive, send, path[len(PROGRESS_PREFIX):])
+        if method == "POST" and path == "/api/load_videos_by_user":
+            return await load_videos_by_user(scope, receive, send)
+    return await _wsgi(scope, receive, send)
+
+
+if __name__ == "__main__":
+    try:
+        import uvicorn
+    except ImportError:
+        sys.exit("ASGI mode needs an ASGI server: pip install uvicorn")
+    uvicorn.run(application, host="127.0.0.1", port=int(os.environ.get("PORT", 5000)))
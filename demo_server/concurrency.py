@@ -0,0 +1,112 @@
+import asyncio
+import time
+
+import httpx
+
+# Bounds for batches running with adaptive concurrency
+ADAPTIVE_MIN_CONCURRENCY = 1
+ADAPTIVE_MAX_CONCURRENCY = 32
+# A window must beat the previous one by this fraction to count as an improvement
+THROUGHPUT_GAIN = 0.05
+
+THROTTLE_STATUS_CODES = (403, 429)
+
+
+def is_throttle_error(exc: BaseException) -> bool:
+    """Return True for errors that mean the remote side wants us to slow down."""
+    if isinstance(exc, httpx.TimeoutException):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in THROTTLE_STATUS_CODES
+    return False
+
+
+class AdaptiveLimiter:
+    """Concurrency limit that adapts to throughput and throttling (AIMD).
+
+    Used as ``async with limiter:`` like a semaphore whose size changes. Completed
+    items are grouped into windows of ``limit`` items; after each window the limit
+    grows by one while items/second keeps improving (or as a probe after a step
+    down) and shrinks by one when the last increase did not pay off. A throttle
+    signal (403/429/timeout) halves the limit at most once per window.
+
+    With ``min_limit == max_limit`` it behaves as a plain fixed semaphore.
+    """
+
+    def __init__(
+            self,
+            initial: int,
+            min_limit: int = ADAPTIVE_MIN_CONCURRENCY,
+            max_limit: int = ADAPTIVE_MAX_CONCURRENCY,
+            gain: float = THROUGHPUT_GAIN,
+    ):
+        self.min_limit = max(1, min(min_limit, max_limit))
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = min(max(initial, self.min_limit), self.max_limit)
+        self.gain = gain
+        self.in_flight = 0
+        self._cond = asyncio.Condition()
+        self._last_rate = 0.0
+        self._last_step = 0
+        self._reset_window()
+
+    @property
+    def adaptive(self) -> bool:
+        return self.min_limit != self.max_limit
+
+    def _reset_window(self):
+        self._window_start = time.monotonic()
+        self._window_done = 0
+        self._window_throttled = False
+
+    async def __aenter__(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def _set_limit(self, limit: int):
+        self.limit = min(max(limit, self.min_limit), self.max_limit)
+
+    def on_success(self):
+        """Record a finished item and adjust the limit at the end of a window."""
+        if not self.adaptive:
+            return
+        self._window_done += 1
+        if self._window_done < self.limit:
+            return
+        elapsed = max(time.monotonic() - self._window_start, 1e-6)
+        rate = self._window_done / elapsed
+        if self._last_rate == 0.0 or rate > self._last_rate * (1 + self.gain) or self._last_step <= 0:
+            step = 1
+        else:
+            # The previous increase did not raise throughput: step back
+            step = -1
+        self._set_limit(self.limit + step)
+        self._last_step = step
+        self._last_rate = rate
+        self._reset_window()
+        self._wake()
+
+    def on_throttle(self):
+        """Record a throttle signal: multiplicative decrease, once per window."""
+        if not self.adaptive or self._window_throttled:
+            return
+        self._set_limit(self.limit // 2)
+        self._last_step = -1
+        self._last_rate = 0.0
+        self._reset_window()
+        self._window_throttled = True
+
+    def _wake(self):
+        # A raised limit may let waiters in; notify from a task holding the lock
+        asyncio.ensure_future(self._notify())
+
+    async def _notify(self):
+        async with self._cond:
+            self._cond.notify_all()
@@ -40,6 +40,7 @@ import re
 from httpx import Response
 
 from douyin_tiktok.utils.logger import logger
+from rate_limiter import rate_limiter
 from douyin_tiktok.utils.api_exceptions import (
     APIError,
     APIConnectionError,
@@ -183,6 +184,8 @@ class BaseCrawler:
         """
         for attempt in range(self._max_retries):
             try:
+                # 按主机限速 / Per-host rate limit shared with the download engine
+                await rate_limiter.acquire(url)
                 response = await self.aclient.get(url, follow_redirects=True)
                 if not response.text.strip() or not response.content:
                     error_message = "第 {0} 次响应内容为空, 状态码: {1}, URL:{2}".format(attempt + 1,
@@ -227,6 +230,8 @@ class BaseCrawler:
         """
         for attempt in range(self._max_retries):
             try:
+                # 按主机限速 / Per-host rate limit shared with the download engine
+                await rate_limiter.acquire(url)
                 response = await self.aclient.post(
                     url,
                     json=None if not params else dict(params),
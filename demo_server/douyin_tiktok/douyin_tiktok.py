@@ -3,6 +3,7 @@ import os
 import time
 from urllib.parse import urlencode, quote
 import sys
+from yt_dlp import YoutubeDL
 from .douyin.abogus import ABogus as AB
 from .base_crawler import BaseCrawler
 from .douyin.xbogus import XBogus as XB
@@ -107,41 +108,50 @@ class DouyinTiktokScraper:
             }
 
 
-    async def douyin_fetch_user_post_videos(self, sec_user_id: str, max_cursor: int, count: int=50):
-        items = []
-        while True:
-            # print("max_cursor", max_cursor)
-            kwargs = {'headers': {'Accept-Language': 'zh-CN,zh;q=0.8,zh-TW;q=0.7,zh-HK;q=0.5,en-US;q=0.3,en;q=0.2', 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.212 Safari/537.36', 'Referer': 'https://www.douyin.com/', 'Cookie': self.douyin_cookie}, 'proxies': {'http://': None, 'https://': None}}
-            params_dict = {'device_platform': 'webapp', 'aid': '6383', 'channel': 'channel_pc_web', 'pc_client_type': 1, 'version_code': '290100', 'version_name': '29.1.0', 'cookie_enabled': 'true', 'screen_width': 1920, 'screen_height': 1080, 'browser_language': 'zh-CN', 'browser_platform': 'Win32', 'browser_name': 'Chrome', 'browser_version': '130.0.0.0', 'browser_online': 'true', 'engine_name': 'Blink', 'engine_version': '130.0.0.0', 'os_name': 'Windows', 'os_version': '10', 'cpu_core_num': 12, 'device_memory': 8, 'platform': 'PC', 'downlink': '10', 'effective_type': '4g', 'from_user_page': '1', 'locate_query': 'false', 'need_time_list': '1', 'pc_libra_divert': 'Windows', 'publish_video_strategy_type': '2', 'round_trip_time': '0', 'show_live_replay_strategy': '1', 'time_list_query': '0', 'whale_cut_token': '', 'update_version_code': '170400', 'msToken': '', 'max_cursor': max_cursor, 'count': count, 'sec_user_id': sec_user_id}
-            params_dict["msToken"] = ''
-            a_bogus = BogusManager.ab_model_2_endpoint(params_dict, kwargs["headers"]["User-Agent"])
-            base_crawler = BaseCrawler(proxies=kwargs["proxies"], crawler_headers=kwargs["headers"])
-            async with base_crawler as crawler:
+    async def douyin_iter_user_post_pages(self, sec_user_id: str, max_cursor: int = 0, count: int = 50):
+        """Yield a user's posts one API page at a time (a list of items per page), as they are crawled."""
+        kwargs = {'headers': {'Accept-Language': 'zh-CN,zh;q=0.8,zh-TW;q=0.7,zh-HK;q=0.5,en-US;q=0.3,en;q=0.2', 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.212 Safari/537.36', 'Referer': 'https://www.douyin.com/', 'Cookie': self.douyin_cookie}, 'proxies': {'http://': None, 'https://': None}}
+        base_crawler = BaseCrawler(proxies=kwargs["proxies"], crawler_headers=kwargs["headers"])
+        # One client for the whole crawl: pages reuse the same connection
+        async with base_crawler as crawler:
+            while True:
+                # print("max_cursor", max_cursor)
+                params_dict = {'device_platform': 'webapp', 'aid': '6383', 'channel': 'channel_pc_web', 'pc_client_type': 1, 'version_code': '290100', 'version_name': '29.1.0', 'cookie_enabled': 'true', 'screen_width': 1920, 'screen_height': 1080, 'browser_language': 'zh-CN', 'browser_platform': 'Win32', 'browser_name': 'Chrome', 'browser_version': '130.0.0.0', 'browser_online': 'true', 'engine_name': 'Blink', 'engine_version': '130.0.0.0', 'os_name': 'Windows', 'os_version': '10', 'cpu_core_num': 12, 'device_memory': 8, 'platform': 'PC', 'downlink': '10', 'effective_type': '4g', 'from_user_page': '1', 'locate_query': 'false', 'need_time_list': '1', 'pc_libra_divert': 'Windows', 'publish_video_strategy_type': '2', 'round_trip_time': '0', 'show_live_replay_strategy': '1', 'time_list_query': '0', 'whale_cut_token': '', 'update_version_code': '170400', 'msToken': '', 'max_cursor': max_cursor, 'count': count, 'sec_user_id': sec_user_id}
+                params_dict["msToken"] = ''
+                a_bogus = BogusManager.ab_model_2_endpoint(params_dict, kwargs["headers"]["User-Agent"])
                 endpoint = f"https://www.douyin.com/aweme/v1/web/aweme/post/?{urlencode(params_dict)}&a_bogus={a_bogus}"
                 response = await crawler.fetch_get_json(endpoint)
-            for item in response.get("aweme_list", []):
-                url = "https://douyin.com/video/" + item.get("aweme_id")
-                title = item.get("desc") or item.get("caption") or item.get("item_title") or ""
-                stats = item.get("statistics", {})
-                view = stats.get("play_count", 0)
-                collect = stats.get("collect_count", 0)
-                like = stats.get("digg_count", 0)
-                comment = stats.get("comment_count", 0)
-                share = stats.get("share_count", 0)
-                items.append({
-                    "url": url,
-                    "title": title,
-                    "views": view,
-                    "collects": collect,
-                    "likes": like,
-                    "comments": comment,
-                    "shares": share
-                })
-            max_cursor = response.get("max_cursor", 0)
-            has_more = response.get("has_more", 0)
-            # print("has_more", has_more)
-            if has_more == 0:
-                break
+                items = []
+                for item in response.get("aweme_list", []):
+                    url = "https://douyin.com/video/" + item.get("aweme_id")
+                    title = item.get("desc") or item.get("caption") or item.get("item_title") or ""
+                    stats = item.get("statistics", {})
+                    view = stats.get("play_count", 0)
+                    collect = stats.get("collect_count", 0)
+                    like = stats.get("digg_count", 0)
+                    comment = stats.get("comment_count", 0)
+                    share = stats.get("share_count", 0)
+                    items.append({
+                        "url": url,
+                        "title": title,
+                        "views": view,
+                        "collects": collect,
+                        "likes": like,
+                        "comments": comment,
+                        "shares": share
+                    })
+                if items:
+                    yield items
+                max_cursor = response.get("max_cursor", 0)
+                has_more = response.get("has_more", 0)
+                # print("has_more", has_more)
+                if has_more == 0:
+                    break
+
+    async def douyin_fetch_user_post_videos(self, sec_user_id: str, max_cursor: int, count: int=50):
+        items = []
+        async for page in self.douyin_iter_user_post_pages(sec_user_id, max_cursor, count):
+            items.extend(page)
         # print(items)
         return items
 
@@ -161,6 +171,10 @@ class DouyinTiktokScraper:
 
 
     async def tiktok_fetch_user_post(self, username: str):
+        # yt-dlp blocks, so the listing runs off the event loop
+        return await asyncio.to_thread(self.tiktok_list_user_post, username)
+
+    def tiktok_list_user_post(self, username: str):
         option_data = {
             "quiet": True,
             "extract_flat": True,
@@ -0,0 +1,60 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Coroutine, Optional
+
+from media_client import MediaClient
+from segmented_download import DOWNLOAD_SEGMENTS
+
+# Items downloading at once across every batch on the server
+GLOBAL_MAX_DOWNLOADS = 16
+
+
+class DownloadEngine:
+    """Long-lived background event loop shared by every download batch.
+
+    Flask request threads submit batch coroutines with ``submit`` (a thin wrapper
+    over ``asyncio.run_coroutine_threadsafe``). All batches run on the one loop,
+    share one pooled :class:`MediaClient` and acquire ``global_slots`` per item,
+    so total outbound concurrency stays bounded however many batches are queued.
+    """
+
+    def __init__(self, max_downloads: int = GLOBAL_MAX_DOWNLOADS):
+        self.max_downloads = max_downloads
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.global_slots: Optional[asyncio.Semaphore] = None
+        self.client: Optional[MediaClient] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    def start(self):
+        """Start the loop thread once; later calls are no-ops."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="download-engine", daemon=True)
+                self._thread.start()
+        self._ready.wait()
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self.loop = loop
+        self.global_slots = asyncio.Semaphore(self.max_downloads)
+        self.client = MediaClient(max_streams=self.max_downloads * DOWNLOAD_SEGMENTS)
+        self._ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            loop.run_until_complete(self.client.close())
+            loop.close()
+
+    def submit(self, coro: Coroutine[Any, Any, Any]) -> Future:
+        """Schedule ``coro`` on the engine loop from any thread."""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call_soon(self, callback, *args):
+        """Run a plain callback on the engine loop from any thread."""
+        self.start()
+        self.loop.call_soon_threadsafe(callback, *args)
@@ -0,0 +1,121 @@
+import asyncio
+import bisect
+import threading
+import weakref
+from collections import deque
+from itertools import islice
+from operator import itemgetter
+from typing import Any, Dict, List, Optional, Tuple
+
+# Events kept per batch for subscribers that attach late or reconnect
+EVENT_BUFFER_SIZE = 1024
+# Event types after which a batch publishes nothing more
+FINAL_EVENT_TYPES = ("completed", "error")
+# Event types where only the newest matters: kept in one slot outside the
+# buffer, so frequent snapshots never push item events out of it
+LATEST_ONLY_EVENT_TYPES = ("snapshot",)
+
+Event = Tuple[int, Dict[str, Any]]
+
+
+class EventStream:
+    """Progress events of one batch, readable by any number of subscribers.
+
+    Events get increasing ids and go into a ring buffer of ``maxlen``. Readers
+    never consume anything: each remembers the last id it saw (the SSE
+    ``Last-Event-ID``) and asks for what came after, so publishing costs the
+    same however many tabs, reconnects or scripts are watching.
+
+    Snapshot events replace each other in a single slot instead of taking
+    buffer space; a reader behind the latest one gets just that one.
+
+    Threads wait with ``read``; coroutines with ``read_async``, which shares
+    one wake-up per event loop among all of that loop's readers.
+    """
+
+    def __init__(self, maxlen: int = EVENT_BUFFER_SIZE):
+        self._events: "deque[Event]" = deque(maxlen=maxlen)
+        self._latest: Optional[Event] = None
+        # Id of the newest event pushed out of the buffer
+        self._dropped_id = 0
+        self._cond = threading.Condition()
+        self.last_id = 0
+        self.closed = False
+        # Per loop, the asyncio.Event its readers are waiting on
+        self._loop_events: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Event]" = weakref.WeakKeyDictionary()
+
+    def publish(self, event: Dict[str, Any]) -> int:
+        with self._cond:
+            self.last_id += 1
+            if event.get("type") in LATEST_ONLY_EVENT_TYPES:
+                self._latest = (self.last_id, event)
+            else:
+                if len(self._events) == self._events.maxlen:
+                    self._dropped_id = self._events[0][0]
+                self._events.append((self.last_id, event))
+            if event.get("type") in FINAL_EVENT_TYPES:
+                self.closed = True
+            self._cond.notify_all()
+            loops = list(self._loop_events.keys())
+            event_id = self.last_id
+        for loop in loops:
+            try:
+                loop.call_soon_threadsafe(self._wake, loop)
+            except RuntimeError:
+                # Loop closed
+                pass
+        return event_id
+
+    def _wake(self, loop: asyncio.AbstractEventLoop):
+        # Runs on ``loop``: release its readers, later readers get a fresh event
+        with self._cond:
+            waiting = self._loop_events.pop(loop, None)
+        if waiting is not None:
+            waiting.set()
+
+    @property
+    def first_id(self) -> int:
+        """Oldest id a reader can resume from without missing buffered events."""
+        with self._cond:
+            return self._dropped_id + 1
+
+    def _after(self, after_id: int, limit: int) -> List[Event]:
+        if after_id >= self.last_id:
+            return []
+        start = bisect.bisect_right(self._events, after_id, key=itemgetter(0))
+        events = list(islice(self._events, start, start + limit))
+        if self._latest is not None and self._latest[0] > after_id:
+            bisect.insort(events, self._latest, key=itemgetter(0))
+            del events[limit:]
+        return events
+
+    def read(self, after_id: int, timeout: Optional[float] = None, limit: int = EVENT_BUFFER_SIZE) -> List[Event]:
+        """Return up to ``limit`` events newer than ``after_id``.
+
+        Blocks up to ``timeout`` seconds for one to arrive; returns an empty
+        list on timeout or when the stream is closed and fully read.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: after_id < self.last_id or self.closed, timeout)
+            return self._after(after_id, limit)
+
+    async def read_async(self, after_id: int, timeout: Optional[float] = None, limit: int = EVENT_BUFFER_SIZE) -> List[Event]:
+        """Coroutine version of ``read`` that does not block its event loop."""
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            if after_id < self.last_id or self.closed:
+                return self._after(after_id, limit)
+            waiting = self._loop_events.get(loop)
+            if waiting is None:
+                waiting = self._loop_events[loop] = asyncio.Event()
+        try:
+            await asyncio.wait_for(waiting.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        with self._cond:
+            return self._after(after_id, limit)
+
+    def finished(self, after_id: int) -> bool:
+        """True once the stream is closed and ``after_id`` is its last event."""
+        with self._cond:
+            return self.closed and after_id >= self.last_id
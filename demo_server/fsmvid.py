@@ -1,16 +1,55 @@
 import asyncio
-import re
-from typing import Any, Dict, List, Optional, Tuple
+import copy
+import json
+import os
+import time
+import weakref
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple, Union
 
 import httpx
 import sys
 from playwright.async_api import async_playwright
+from rate_limiter import rate_limiter
+from concurrency import AdaptiveLimiter, is_throttle_error
+from quality import QualityPolicy, parse_bitrate, parse_height
+from resolve_cache import ResolveCache, canonical_url
 # if sys.stdout is not None:
 #     sys.stdout.reconfigure(encoding="utf-8")
 import uuid
 
 FSMVID_DOWNLOAD_URL = "https://fsmvid.com/api/proxy"
 FSMVID_BASE_URL = "https://fsmvid.com/"
+# Connection pool of the long-lived API client (HTTP/2 multiplexes onto few connections)
+FSMVID_MAX_CONNECTIONS = 4
+FSMVID_KEEPALIVE_EXPIRY = 120.0
+# Resolutions in flight at once for download_many
+FSMVID_RESOLVE_CONCURRENCY = 8
+# Cookies are renewed this long before they expire, and at least this often
+COOKIE_REFRESH_MARGIN = 5 * 60
+COOKIE_MAX_AGE = 30 * 60
+# Wait before retrying a failed background refresh
+COOKIE_RETRY_DELAY = 60
+# Background refreshes never run closer together than this, even if a cookie
+# expires sooner
+COOKIE_MIN_REFRESH_INTERVAL = 60
+
+FSMVID_HEADERS = {
+    "accept": "*/*",
+    # "accept-encoding": "gzip, deflate, br, zstd", # Let httpx handle encoding
+    "accept-language": "en-US,en;q=0.9",
+    "content-type": "application/json",
+    "origin": "https://fsmvid.com",
+    "priority": "u=1, i",
+    "referer": "https://fsmvid.com/",
+    "sec-ch-ua": '"Chromium";v="142", "Google Chrome";v="142", "Not_A Brand";v="99"',
+    "sec-ch-ua-mobile": "?0",
+    "sec-ch-ua-platform": '"Windows"',
+    "sec-fetch-dest": "empty",
+    "sec-fetch-mode": "cors",
+    "sec-fetch-site": "same-origin",
+    "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/142.0.0.0 Safari/537.36",
+}
 
 async def _get_cookies_via_playwright() -> str:
     """Launch Playwright headlessly, navigate to FSMVID base URL, and return cookies as a header string."""
@@ -23,160 +62,363 @@ async def _get_cookies_via_playwright() -> str:
         return "; ".join(f"{c['name']}={c['value']}" for c in cookies)
 
 
+def _cookie_header(cookies: List[Dict[str, Any]]) -> str:
+    return "; ".join(f"{c['name']}={c['value']}" for c in cookies)
+
+
+class CookieRefresher:
+    """Keeps the FSMVID cookie header fresh ahead of expiry.
+
+    Cookies come from a Playwright browser context that stays open between
+    refreshes (persistent on disk if ``user_data_dir`` is set), so a renewal
+    is a page load rather than a Chromium cold start. A background task renews
+    them ``COOKIE_REFRESH_MARGIN`` before the earliest cookie expiry (or after
+    ``COOKIE_MAX_AGE``), and the jar is saved to ``cookie_file`` so a restart
+    starts with usable cookies.
+
+    The warm browser belongs to the loop that first refreshed; calls from any
+    other loop fall back to a one-off ``_get_cookies_via_playwright``.
+    """
+
+    def __init__(
+            self,
+            cookie_file: Optional[Path] = None,
+            user_data_dir: Optional[Path] = None,
+            max_age: float = COOKIE_MAX_AGE,
+            margin: float = COOKIE_REFRESH_MARGIN,
+    ):
+        self.cookie_file = Path(cookie_file) if cookie_file else None
+        self.user_data_dir = Path(user_data_dir) if user_data_dir else None
+        self.max_age = max_age
+        self.margin = margin
+        self.cookie_header: Optional[str] = None
+        self.expires_at = 0.0
+        # When this process last fetched cookies (0: not yet)
+        self.refreshed_at = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._load()
+
+    @property
+    def refresh_at(self) -> float:
+        return self.expires_at - self.margin
+
+    def _load(self):
+        if self.cookie_file is None:
+            return
+        try:
+            with open(self.cookie_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.cookie_header = _cookie_header(data["cookies"])
+            self.expires_at = float(data["expires_at"])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    def _save(self, cookies: List[Dict[str, Any]]):
+        if self.cookie_file is None:
+            return
+        tmp_path = self.cookie_file.with_name(self.cookie_file.name + ".tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"cookies": cookies, "expires_at": self.expires_at}, f)
+            os.replace(tmp_path, self.cookie_file)
+        except OSError as e:
+            print(f"Could not save FSMVID cookies: {e}")
+
+    def ensure_running(self):
+        """Start the background refresh task on the running loop (once)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is None or self._loop.is_closed():
+            # A browser started on a closed loop is unusable; start over here
+            self._context = self._browser = self._playwright = None
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._task = None
+        if loop is self._loop and (self._task is None or self._task.done()):
+            self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            delay = max(self.refresh_at, self.refreshed_at + COOKIE_MIN_REFRESH_INTERVAL) - time.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"FSMVID cookie refresh failed: {e}")
+                await asyncio.sleep(COOKIE_RETRY_DELAY)
+
+    async def refresh(self, stale: Optional[str] = None) -> str:
+        """Fetch new cookies and return the header.
+
+        If ``stale`` is given and another caller already replaced that header,
+        the newer header is returned without fetching again.
+        """
+        if asyncio.get_running_loop() is not self._loop:
+            header = await _get_cookies_via_playwright()
+            self.cookie_header = header
+            return header
+        async with self._lock:
+            if stale is not None and self.cookie_header not in (None, stale):
+                return self.cookie_header
+            cookies = await self._fetch_cookies()
+            now = self.refreshed_at = time.time()
+            # Session cookies (-1) and ones already expired don't set the next refresh
+            expiries = [c["expires"] for c in cookies if c.get("expires", -1) > now]
+            self.expires_at = min(expiries + [now + self.max_age])
+            self.cookie_header = _cookie_header(cookies)
+            self._save(cookies)
+            return self.cookie_header
+
+    async def _fetch_cookies(self) -> List[Dict[str, Any]]:
+        if self._context is None:
+            self._playwright = await async_playwright().start()
+            if self.user_data_dir is not None:
+                self._context = await self._playwright.chromium.launch_persistent_context(
+                    str(self.user_data_dir), headless=True
+                )
+            else:
+                self._browser = await self._playwright.chromium.launch(headless=True)
+                self._context = await self._browser.new_context()
+        page = await self._context.new_page()
+        try:
+            await page.goto(FSMVID_BASE_URL)
+            await page.wait_for_load_state("networkidle")
+            return await self._context.cookies(FSMVID_BASE_URL)
+        except Exception:
+            # Drop a broken browser so the next refresh starts a clean one
+            await self.close()
+            raise
+        finally:
+            if not page.is_closed():
+                await page.close()
+
+    async def close(self):
+        """Shut down the warm browser."""
+        context, browser, playwright = self._context, self._browser, self._playwright
+        self._context = self._browser = self._playwright = None
+        for closable in (context, browser):
+            if closable is not None:
+                try:
+                    await closable.close()
+                except Exception:
+                    pass
+        if playwright is not None:
+            await playwright.stop()
+
+
 class FSMVIDDown:
     """Singleton class to interact with FSMVID API with optional cookie handling."""
 
     _instance: Optional["FSMVIDDown"] = None
-    _cookie_lock: asyncio.Lock = asyncio.Lock()
-    _cached_cookie: Optional[str] = None
+    # Swap in one with a cookie_file/user_data_dir to persist cookies across restarts
+    cookie_refresher: CookieRefresher = CookieRefresher()
+    # Resolved results keyed by (platform, canonical URL); swap in a disk-backed one to persist
+    resolve_cache: ResolveCache = ResolveCache()
+    # Stream ranking used when a caller passes no policy
+    default_policy: QualityPolicy = QualityPolicy()
+    # One long-lived HTTP/2 client per event loop; entries vanish with their loop
+    _clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
 
     def __new__(cls, *args, **kwargs) -> "FSMVIDDown":
         if cls._instance is None:
             cls._instance = super(FSMVIDDown, cls).__new__(cls)
         return cls._instance
 
-    async def download(self, platform: str, download_url: str, cookie: str | None = None) -> Dict[str, Any]:
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the pooled API client bound to the running event loop.
+
+        httpx connections belong to the loop that opened them, so a client is
+        created per loop (and again if the previous one was closed).
+        """
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                http2=True,
+                timeout=httpx.Timeout(15.0, connect=10.0, read=10.0),
+                headers=FSMVID_HEADERS,
+                limits=httpx.Limits(
+                    max_connections=FSMVID_MAX_CONNECTIONS,
+                    max_keepalive_connections=FSMVID_MAX_CONNECTIONS,
+                    keepalive_expiry=FSMVID_KEEPALIVE_EXPIRY,
+                ),
+            )
+            self._clients[loop] = client
+        return client
+
+    async def close(self):
+        """Close the API client of the running event loop."""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    async def download(
+            self,
+            platform: str,
+            download_url: str,
+            cookie: str | None = None,
+            policy: Optional[QualityPolicy] = None,
+    ) -> Dict[str, Any]:
         """Call the FSMVID API and return a simplified result.
 
-        If the API does not return the expected schema, the raw JSON is returned
-        for the caller to handle.
+        Streams are picked by ``policy`` (default: best up to 1080p). If the API
+        does not return the expected schema, the raw JSON is returned for the
+        caller to handle. Successful responses are served from ``resolve_cache``
+        until their signed media URLs are about to expire.
         """
+        cached = self.resolve_cache.get(platform, download_url)
+        if cached is not None:
+            return self.select_best_streams(cached, platform, policy)
+
         payload = {"platform": platform, "url": download_url}
 
-        timeout = httpx.Timeout(15.0, connect=10.0, read=10.0)
-        
+        # Cookies are renewed in the background ahead of expiry
+        self.cookie_refresher.ensure_running()
         # Use provided cookie, or cached cookie, or empty string
-        current_cookie = cookie if cookie is not None else self._cached_cookie
-        
-        headers = {
-            "accept": "*/*",
-            # "accept-encoding": "gzip, deflate, br, zstd", # Let httpx handle encoding
-            "accept-language": "en-US,en;q=0.9",
-            "content-type": "application/json",
-            "origin": "https://fsmvid.com",
-            "priority": "u=1, i",
-            "referer": "https://fsmvid.com/",
-            "sec-ch-ua": '"Chromium";v="142", "Google Chrome";v="142", "Not_A Brand";v="99"',
-            "sec-ch-ua-mobile": "?0",
-            "sec-ch-ua-platform": '"Windows"',
-            "sec-fetch-dest": "empty",
-            "sec-fetch-mode": "cors",
-            "sec-fetch-site": "same-origin",
-            "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/142.0.0.0 Safari/537.36",
-            "Cookie": current_cookie if current_cookie is not None else ""
-        }
+        current_cookie = cookie if cookie is not None else self.cookie_refresher.cookie_header
+        headers = {"Cookie": current_cookie if current_cookie is not None else ""}
 
-        async with httpx.AsyncClient(http2=True, timeout=timeout, headers=headers) as client:
-            # Try the request with current headers
-            try:
-                resp = await client.post(FSMVID_DOWNLOAD_URL, json=payload)
+        client = self._get_client()
+        # Try the request with current headers
+        try:
+            await rate_limiter.acquire(FSMVID_DOWNLOAD_URL)
+            resp = await client.post(FSMVID_DOWNLOAD_URL, json=payload, headers=headers)
+            resp.raise_for_status()
+            data = resp.json()
+        except httpx.HTTPStatusError as e:
+            # If 403, we need to refresh cookies
+            if e.response.status_code == 403:
+                # Only one refresh runs at a time; if the cookie was already
+                # renewed while we waited, the new one is reused
+                headers["Cookie"] = await self.cookie_refresher.refresh(stale=current_cookie or "")
+                
+                # Retry the request with the new cookie
+                await rate_limiter.acquire(FSMVID_DOWNLOAD_URL)
+                resp = await client.post(FSMVID_DOWNLOAD_URL, json=payload, headers=headers)
                 resp.raise_for_status()
                 data = resp.json()
-            except httpx.HTTPStatusError as e:
-                # If 403, we need to refresh cookies
-                if e.response.status_code == 403:
-                    # Acquire lock to ensure only one process refreshes the cookie
-                    async with self._cookie_lock:
-                        # Check if cookie was refreshed while we were waiting for the lock
-                        if self._cached_cookie != current_cookie and self._cached_cookie is not None:
-                            # Use the new cached cookie
-                            headers["Cookie"] = self._cached_cookie
-                        else:
-                            # Actually refresh the cookie
-                            fresh_cookies = await _get_cookies_via_playwright()
-                            self._cached_cookie = fresh_cookies
-                            headers["Cookie"] = fresh_cookies
-                    
-                    # Retry the request with the new cookie
-                    resp = await client.post(FSMVID_DOWNLOAD_URL, json=payload)
-                    resp.raise_for_status()
-                    data = resp.json()
-                else:
-                    raise
-            except Exception:
+            else:
                 raise
 
         if isinstance(data, dict) and data.get("status") == "success" and "medias" in data:
-            return self.select_best_streams(data, platform)
+            result = self.select_best_streams(data, platform, policy)
+            if result.get("cnt", 0):
+                # Cache the full response so any quality can be picked from it later
+                self.resolve_cache.put(platform, download_url, data)
+            return result
 
         return data
 
-    @staticmethod
-    def _parse_height(media: Dict[str, Any]) -> Optional[int]:
-        """Return height (p) from 'height' field or parse from 'label' like '(1080p)'."""
-        h = media.get("height")
-        if isinstance(h, int):
-            return h
-        label = media.get("label", "") or ""
-        m = re.search(r"(\d{3,4})(?=p\b)", label)
-        return int(m.group(1)) if m else None
+    async def download_many(
+            self,
+            items: Iterable[Tuple[str, str]],
+            concurrency: int = FSMVID_RESOLVE_CONCURRENCY,
+            buffer: Optional[int] = None,
+            policy: Optional[QualityPolicy] = None,
+            limiter: Optional[AdaptiveLimiter] = None,
+    ) -> AsyncIterator[Tuple[int, Union[Dict[str, Any], Exception]]]:
+        """Resolve many ``(platform, url)`` pairs, yielding ``(index, result)`` as each finishes.
 
-    @staticmethod
-    def _bitrate(media: Dict[str, Any]) -> int:
-        """Return bitrate (bit/s); if missing, return 0."""
-        br = media.get("bitrate")
+        Up to ``concurrency`` resolutions run at once over the shared client and
+        cookie refresher. URLs that canonicalise to the same post are resolved
+        once (streams picked by ``policy``) and yielded for every index (each gets its own copy). A failed
+        resolution yields the exception instead of a result. At most ``buffer``
+        finished resolutions wait for the consumer (default: ``concurrency``),
+        so resolution stays only a little ahead of whoever is using the
+        results. Closing the iterator early cancels outstanding work.
+
+        With a ``limiter`` each resolution also holds one of its slots and
+        reports to it, so throttling (403/429/timeouts) shrinks the number in
+        flight below ``concurrency`` and it grows back as requests succeed.
+        """
+        # (platform, canonical URL) -> (indexes, platform, first URL given)
+        groups: Dict[Tuple[str, str], Tuple[List[int], str, str]] = {}
+        for index, (platform, url) in enumerate(items):
+            key = (platform, canonical_url(platform, url))
+            groups.setdefault(key, ([], platform, url))[0].append(index)
+        if not groups:
+            return
+        pending = iter(groups.values())
+        done: asyncio.Queue = asyncio.Queue(maxsize=buffer or concurrency)
+
+        async def resolve(platform: str, url: str) -> Union[Dict[str, Any], Exception]:
+            try:
+                if limiter is None:
+                    return await self.download(platform, url, policy=policy)
+                async with limiter:
+                    result = await self.download(platform, url, policy=policy)
+                limiter.on_success()
+                return result
+            except Exception as e:
+                if limiter is not None and is_throttle_error(e):
+                    limiter.on_throttle()
+                return e
+
+        async def worker():
+            for indexes, platform, url in pending:
+                await done.put((indexes, await resolve(platform, url)))
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(groups)))]
         try:
-            return int(br) if br is not None else 0
-        except (TypeError, ValueError):
-            return 0
+            for _ in range(len(groups)):
+                indexes, result = await done.get()
+                for n, index in enumerate(indexes):
+                    yield index, result if n == 0 or isinstance(result, Exception) else copy.deepcopy(result)
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
 
     @staticmethod
-    def _ext_rank(media: Dict[str, Any]) -> int:
-        """Prefer mp4 over webm when quality is equal."""
-        ext = (media.get("ext") or "").lower()
-        return 0 if ext == "mp4" else 1
+    def _youtube_platform(
+            medias: List[Dict[str, Any]],
+            policy: Optional[QualityPolicy] = None,
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """Select best video/audio for a single media entry (YouTube schema)."""
+        return (policy or FSMVIDDown.default_policy).select(medias)
 
     @staticmethod
-    def _youtube_platform(medias: List[Dict[str, Any]]) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
-        """Select best video/audio for a single media entry (YouTube schema)."""
-        best_video: Optional[Dict[str, Any]] = None
-        best_audio: Optional[Dict[str, Any]] = None
-        for media in medias:
-            if media.get("type") == "video":
-                if best_video is None:
-                    best_video = media
-                else:
-                    hv = FSMVIDDown._parse_height(media) or -1
-                    hb = FSMVIDDown._parse_height(best_video) or -1
-                    if hv > hb and hv <= 1080:
-                        best_video = media
-                    elif hv == hb:
-                        if FSMVIDDown._ext_rank(media) < FSMVIDDown._ext_rank(best_video):
-                            best_video = media
-                        elif FSMVIDDown._bitrate(media) > FSMVIDDown._bitrate(best_video):
-                            best_video = media
-                        else:
-                            fps_new = media.get("fps") or 0
-                            fps_old = best_video.get("fps") or 0
-                            if fps_new > fps_old:
-                                best_video = media
-            elif media.get("type") == "audio":
-                if best_audio is None:
-                    best_audio = media
-                else:
-                    br_new = FSMVIDDown._bitrate(media)
-                    br_old = FSMVIDDown._bitrate(best_audio)
-                    if br_new > br_old:
-                        best_audio = media
-                    elif br_new == br_old:
-                        pref = {"m4a": 0, "mp4": 1, "webm": 2}
-                        rank_new = pref.get((media.get("ext") or "").lower(), 99)
-                        rank_old = pref.get((best_audio.get("ext") or "").lower(), 99)
-                        if rank_new < rank_old:
-                            best_audio = media
-        return best_video, best_audio
+    def _first_within(
+            medias: List[Dict[str, Any]],
+            policy: Optional[QualityPolicy] = None,
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """Return the first media, or the policy's pick if the first is taller than allowed.
+
+        These platforms list their preferred (e.g. watermark-free) variant
+        first, so it is only passed over when a smaller one was asked for, or
+        for the audio track in audio-only mode.
+        """
+        if not medias:
+            return None, None
+        policy = policy or FSMVIDDown.default_policy
+        if policy.audio_only:
+            _, best_audio = policy.select(medias)
+            if best_audio is not None:
+                return None, best_audio
+        height = parse_height(medias[0])
+        if policy.max_height is None or height is None or height <= policy.max_height:
+            return medias[0], None
+        best_video, _ = policy.select(medias)
+        return best_video or medias[0], None
 
     @staticmethod
-    def _tiktok_douyin_platform(medias: List[Dict[str, Any]]) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
-        best_video, best_audio = None, None
-        best_video = medias[0]
-        return best_video, best_audio
+    def _tiktok_douyin_platform(
+            medias: List[Dict[str, Any]],
+            policy: Optional[QualityPolicy] = None,
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        return FSMVIDDown._first_within(medias, policy)
 
     @staticmethod
-    def _facebook_platform(medias: List[Dict[str, Any]]) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
-        best_video, best_audio = None, None
-        best_video = medias[0]
-        return best_video, best_audio
+    def _facebook_platform(
+            medias: List[Dict[str, Any]],
+            policy: Optional[QualityPolicy] = None,
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        return FSMVIDDown._first_within(medias, policy)
 
     @staticmethod
     def _switch_platform(media: Dict[str, Any], platform: str) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
@@ -202,10 +444,10 @@ class FSMVIDDown:
                 return (media if ext == "mp4" else None), None
 
     @staticmethod
-    def select_best_streams(datas: Dict[str, Any], platform: str) -> Dict[str, Any]:
+    def select_best_streams(datas: Dict[str, Any], platform: str, policy: Optional[QualityPolicy] = None) -> Dict[str, Any]:
         """Select the best video and audio from the list of medias.
 
-        - Video: larger height is better; if equal, prefer mp4, then higher bitrate, then higher fps.
+        - Video: tallest within ``policy.max_height``; if equal, prefer mp4, then higher bitrate, then higher fps.
         - Audio: higher bitrate is better; if equal, prefer m4a/mp4 over webm.
         """
         best_video: Optional[Dict[str, Any]] = None
@@ -214,19 +456,23 @@ class FSMVIDDown:
 
         video_id = uuid.uuid4().hex
         if platform == "tiktok" or platform == "douyin":
-            best_video, best_audio = FSMVIDDown._tiktok_douyin_platform(medias)
+            best_video, best_audio = FSMVIDDown._tiktok_douyin_platform(medias, policy)
             id = datas.get("id") or ""
             if id:
                 video_id = id
         if platform == "facebook":
-            best_video, best_audio = FSMVIDDown._facebook_platform(medias)
+            best_video, best_audio = FSMVIDDown._facebook_platform(medias, policy)
             link = datas.get("url") or ""
             if link.startswith("https://www.facebook.com/reel/"):
                 video_id = link.split("https://www.facebook.com/reel/")[-1]
                 video_id = video_id.split("/")[0]
                 
         if platform == "youtube":
-            best_video, best_audio = FSMVIDDown._youtube_platform(medias)
+            best_video, best_audio = FSMVIDDown._youtube_platform(medias, policy)
+            # Stable id keeps the filename (and its resumable .part) the same across resolves
+            id = datas.get("id") or ""
+            if id:
+                video_id = id
 
         picked = [x for x in (best_video, best_audio) if x is not None]
         return {
@@ -239,10 +485,10 @@ class FSMVIDDown:
             "cnt": len(picked),
             "medias": picked,
             "debug": {
-                "video_height": FSMVIDDown._parse_height(best_video) if best_video else None,
-                "video_bitrate": FSMVIDDown._bitrate(best_video) if best_video else None,
+                "video_height": parse_height(best_video) if best_video else None,
+                "video_bitrate": parse_bitrate(best_video) if best_video else None,
                 "video_fps": best_video.get("fps") if best_video else None,
-                "audio_bitrate": FSMVIDDown._bitrate(best_audio) if best_audio else None,
+                "audio_bitrate": parse_bitrate(best_audio) if best_audio else None,
             },
         }
 
@@ -0,0 +1,164 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Batches kept in memory at once (least recently used are dropped first)
+JOB_CACHE_SIZE = 64
+# Finished batches are deleted after this many seconds
+JOB_TTL = 7 * 24 * 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS batches (
+    download_id TEXT PRIMARY KEY,
+    status      TEXT NOT NULL,
+    total       INTEGER NOT NULL,
+    completed   INTEGER NOT NULL DEFAULT 0,
+    created_at  REAL NOT NULL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS items (
+    download_id TEXT NOT NULL,
+    url         TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    result      TEXT,
+    updated_at  REAL NOT NULL,
+    PRIMARY KEY (download_id, url)
+);
+CREATE INDEX IF NOT EXISTS batches_finished_at ON batches (finished_at);
+"""
+
+
+class JobStore:
+    """SQLite-backed store for download batches and their per-item results.
+
+    The database runs in WAL mode so the download loop can write item results
+    while request threads read progress. Batch headers (status/total/completed)
+    are cached in a bounded LRU; per-item results live only on disk. Finished
+    batches are evicted after ``ttl`` seconds.
+    """
+
+    def __init__(self, path: Path, cache_size: int = JOB_CACHE_SIZE, ttl: float = JOB_TTL):
+        self.path = Path(path)
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def _remember(self, download_id: str, batch: Dict[str, Any]):
+        self._cache[download_id] = batch
+        self._cache.move_to_end(download_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def create_batch(self, download_id: str, urls: List[str]):
+        """Record a new batch with every item pending."""
+        now = time.time()
+        batch = {"status": "started", "total": len(urls), "completed": 0}
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO batches (download_id, status, total, completed, created_at) VALUES (?, ?, ?, 0, ?)",
+                    (download_id, batch["status"], batch["total"], now),
+                )
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO items (download_id, url, status, updated_at) VALUES (?, ?, 'pending', ?)",
+                    [(download_id, url, now) for url in urls],
+                )
+            self._remember(download_id, batch)
+
+    def record_result(self, download_id: str, url: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Store one item's result, bump the batch's completed count and return the batch."""
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE items SET status = ?, result = ?, updated_at = ? WHERE download_id = ? AND url = ?",
+                    (result.get("status", ""), json.dumps(result, ensure_ascii=False), time.time(), download_id, url),
+                )
+                self._conn.execute(
+                    "UPDATE batches SET completed = completed + 1 WHERE download_id = ?", (download_id,)
+                )
+            cached = self._cache.get(download_id)
+            if cached is not None:
+                batch = dict(cached, completed=cached["completed"] + 1)
+            else:
+                batch = self._load(download_id) or {"status": "started", "total": 0, "completed": 0}
+            self._remember(download_id, batch)
+            return dict(batch)
+
+    def finish_batch(self, download_id: str, status: str = "completed"):
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE batches SET status = ?, finished_at = ? WHERE download_id = ?",
+                    (status, time.time(), download_id),
+                )
+            batch = self._load(download_id)
+            if batch is not None:
+                self._remember(download_id, dict(batch, status=status))
+
+    def get_batch(self, download_id: str) -> Optional[Dict[str, Any]]:
+        """Return ``{status, total, completed}`` for a batch, or None if unknown."""
+        with self._lock:
+            batch = self._load(download_id)
+            if batch is not None:
+                self._remember(download_id, batch)
+            return dict(batch) if batch is not None else None
+
+    def get_items(self, download_id: str) -> List[Dict[str, Any]]:
+        """Return the stored result of every finished item in a batch."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url, status, result FROM items WHERE download_id = ? AND result IS NOT NULL",
+                (download_id,),
+            ).fetchall()
+        return [dict(json.loads(result), url=url, status=status) for url, status, result in rows]
+
+    def _load(self, download_id: str) -> Optional[Dict[str, Any]]:
+        batch = self._cache.get(download_id)
+        if batch is not None:
+            return batch
+        row = self._conn.execute(
+            "SELECT status, total, completed FROM batches WHERE download_id = ?", (download_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"status": row[0], "total": row[1], "completed": row[2]}
+
+    def mark_interrupted(self) -> int:
+        """Flag batches left running by a previous process. Return how many were found."""
+        with self._lock:
+            with self._conn:
+                cur = self._conn.execute(
+                    "UPDATE batches SET status = 'interrupted', finished_at = ? WHERE finished_at IS NULL",
+                    (time.time(),),
+                )
+            self._cache.clear()
+            return cur.rowcount
+
+    def evict_expired(self) -> List[str]:
+        """Delete finished batches older than the TTL. Return their ids."""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            ids = [row[0] for row in self._conn.execute(
+                "SELECT download_id FROM batches WHERE finished_at IS NOT NULL AND finished_at < ?", (cutoff,)
+            )]
+            if ids:
+                with self._conn:
+                    self._conn.executemany("DELETE FROM items WHERE download_id = ?", [(i,) for i in ids])
+                    self._conn.executemany("DELETE FROM batches WHERE download_id = ?", [(i,) for i in ids])
+                for download_id in ids:
+                    self._cache.pop(download_id, None)
+            return ids
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,83 @@
+import asyncio
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from rate_limiter import rate_limiter
+
+# Pool settings for media (CDN) downloads
+MEDIA_MAX_CONNECTIONS = 100
+MEDIA_MAX_CONNECTIONS_PER_HOST = 8
+MEDIA_MAX_KEEPALIVE_CONNECTIONS = 32
+MEDIA_KEEPALIVE_EXPIRY = 60.0
+# A CDN that stops sending for this long times out (a throttle signal); dropped
+# ranges are resumed by the segment retries. No pool timeout: streams already
+# wait on the stream/host slots.
+MEDIA_TIMEOUT = httpx.Timeout(30.0, connect=10.0, pool=None)
+
+
+class MediaClient:
+    """Pooled HTTP client shared by every media download of a batch.
+
+    Wraps a single long-lived ``httpx.AsyncClient`` so downloads to the same CDN
+    host reuse TCP/TLS (and HTTP/2) connections instead of paying a fresh
+    handshake per file, and caps the number of concurrent streams per host and,
+    optionally, across the whole batch (``max_streams``).
+    """
+
+    def __init__(
+            self,
+            max_connections: int = MEDIA_MAX_CONNECTIONS,
+            max_connections_per_host: int = MEDIA_MAX_CONNECTIONS_PER_HOST,
+            max_keepalive_connections: int = MEDIA_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry: float = MEDIA_KEEPALIVE_EXPIRY,
+            max_streams: Optional[int] = None,
+            http2: bool = True,
+            timeout: httpx.Timeout = MEDIA_TIMEOUT,
+    ):
+        self.max_connections_per_host = max_connections_per_host
+        self.max_streams = max_streams
+        self._stream_slots = asyncio.Semaphore(max_streams) if max_streams else None
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self.aclient = httpx.AsyncClient(
+            timeout=timeout,
+            follow_redirects=True,
+            http2=http2,
+            limits=self.limits,
+        )
+
+    def _host_slot(self, url: str) -> asyncio.Semaphore:
+        """Return the semaphore limiting concurrent streams to the host of ``url``."""
+        host = urlsplit(url).netloc.lower()
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = asyncio.Semaphore(self.max_connections_per_host)
+            self._host_slots[host] = slot
+        return slot
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        """Open a streaming request on the shared pool, respecting stream and rate limits."""
+        async with AsyncExitStack() as stack:
+            if self._stream_slots is not None:
+                await stack.enter_async_context(self._stream_slots)
+            await stack.enter_async_context(self._host_slot(url))
+            await rate_limiter.acquire(url)
+            response = await stack.enter_async_context(self.aclient.stream(method, url, **kwargs))
+            yield response
+
+    async def close(self):
+        await self.aclient.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclient.aclose()
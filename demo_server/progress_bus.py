@@ -0,0 +1,133 @@
+import asyncio
+import time
+from typing import Any, Callable, Dict, Optional
+
+# Seconds between progress snapshots of a batch
+PROGRESS_INTERVAL = 0.25
+# Weight of the newest interval in the smoothed throughput
+THROUGHPUT_SMOOTHING = 0.3
+
+
+class ItemProgress:
+    """Byte counters of one item.
+
+    Updated on every chunk, so updates are plain integer adds with no locking
+    or event: ``add``/``add_total`` from the download loop, ``set`` from a
+    yt-dlp thread (single attribute stores).
+    """
+
+    __slots__ = ("url", "done", "total")
+
+    def __init__(self, url: str):
+        self.url = url
+        self.done = 0
+        self.total = 0
+
+    def add_total(self, nbytes: int):
+        self.total += nbytes
+
+    def add(self, nbytes: int):
+        self.done += nbytes
+
+    def set(self, done: int, total: Optional[int] = None):
+        self.done = done
+        if total:
+            self.total = total
+
+
+class BatchProgress:
+    """Byte and item counters of one batch, read by :class:`ProgressBus` each tick."""
+
+    def __init__(self, total_items: int):
+        self.total_items = total_items
+        self.completed = 0
+        self.active: Dict[str, ItemProgress] = {}
+        self.finished_done = 0
+        self.finished_total = 0
+        self.started = time.monotonic()
+        self.speed = 0.0
+        self._last_done = 0
+        self._last_completed = 0
+        self._last_time = self.started
+
+    def item(self, url: str) -> ItemProgress:
+        """Start tracking an item and return its counters."""
+        progress = self.active.get(url)
+        if progress is None:
+            progress = self.active[url] = ItemProgress(url)
+        return progress
+
+    def finish(self, url: str):
+        """Stop tracking an item and fold its bytes into the batch totals."""
+        self.completed += 1
+        progress = self.active.pop(url, None)
+        if progress is not None:
+            self.finished_done += progress.done
+            self.finished_total += max(progress.total, progress.done)
+
+    def snapshot(self, now: float) -> Optional[Dict[str, Any]]:
+        """Return a progress event, or None if nothing moved since the last one."""
+        active = list(self.active.values())
+        done = self.finished_done + sum(p.done for p in active)
+        if done == self._last_done and self.completed == self._last_completed:
+            return None
+        elapsed = max(now - self._last_time, 1e-6)
+        rate = (done - self._last_done) / elapsed
+        self.speed = rate if self.speed == 0.0 else THROUGHPUT_SMOOTHING * rate + (1 - THROUGHPUT_SMOOTHING) * self.speed
+        self._last_done, self._last_completed, self._last_time = done, self.completed, now
+
+        known_total = self.finished_total + sum(max(p.total, p.done) for p in active)
+        started_items = self.completed + len(active)
+        eta = None
+        if started_items and self.speed > 0:
+            # Items not started yet are assumed to be as large as the average so far
+            expected_total = known_total / started_items * self.total_items
+            eta = max(0.0, expected_total - done) / self.speed
+        return {
+            'type': 'snapshot',
+            'completed': self.completed,
+            'total': self.total_items,
+            'bytes_done': done,
+            'bytes_total': known_total,
+            'speed': round(self.speed),
+            'eta': round(eta, 1) if eta is not None else None,
+            'elapsed': round(now - self.started, 1),
+            'active': [{'url': p.url, 'downloaded_bytes': p.done, 'total_bytes': p.total or None} for p in active],
+        }
+
+
+class ProgressBus:
+    """Publishes coalesced progress snapshots of running batches.
+
+    Downloads only bump counters on their :class:`BatchProgress`; ``run`` wakes
+    every ``interval`` seconds and hands one snapshot per batch that changed to
+    ``publish(download_id, event)``, so event volume is bounded by the tick rate
+    rather than by chunk or item count.
+    """
+
+    def __init__(self, publish: Callable[[str, Dict[str, Any]], None], interval: float = PROGRESS_INTERVAL):
+        self.publish = publish
+        self.interval = interval
+        self.batches: Dict[str, BatchProgress] = {}
+
+    def open(self, download_id: str, total_items: int) -> BatchProgress:
+        batch = self.batches[download_id] = BatchProgress(total_items)
+        return batch
+
+    def close(self, download_id: str):
+        """Publish the batch's last snapshot and stop tracking it."""
+        batch = self.batches.pop(download_id, None)
+        if batch is not None:
+            self._publish(download_id, batch, time.monotonic())
+
+    def _publish(self, download_id: str, batch: BatchProgress, now: float):
+        event = batch.snapshot(now)
+        if event is not None:
+            self.publish(download_id, event)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            for download_id, batch in list(self.batches.items()):
+                self._publish(download_id, batch, now)
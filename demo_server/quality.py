@@ -0,0 +1,93 @@
+import re
+from typing import Any, Dict, Optional, Tuple
+
+# Quality label the UI sends for "best available"
+QUALITY_BEST = "Cao nhất"
+# Height cap applied to "best" (keeps 4K/8K formats out of normal downloads)
+DEFAULT_MAX_HEIGHT = 1080
+
+_HEIGHT_RE = re.compile(r"(\d{3,4})(?=p\b)")
+_VIDEO_EXT_RANK = {"mp4": 0}
+_AUDIO_EXT_RANK = {"m4a": 0, "mp4": 1, "webm": 2}
+
+Media = Dict[str, Any]
+
+
+def parse_height(media: Media) -> Optional[int]:
+    """Return height (p) from 'height' field or parse from 'label' like '(1080p)'."""
+    h = media.get("height")
+    if isinstance(h, int):
+        return h
+    m = _HEIGHT_RE.search(media.get("label", "") or "")
+    return int(m.group(1)) if m else None
+
+
+def parse_bitrate(media: Media) -> int:
+    """Return bitrate (bit/s); if missing, return 0."""
+    br = media.get("bitrate")
+    try:
+        return int(br) if br is not None else 0
+    except (TypeError, ValueError):
+        return 0
+
+
+class QualityPolicy:
+    """Ranks the video/audio formats of one resolved post.
+
+    Video formats at or below ``max_height`` rank above those over it; among
+    those that fit the tallest wins, among those that don't the shortest (so a
+    post with no small enough format still gets its closest one). Ties prefer
+    mp4, then bitrate, then fps. Audio ranks by bitrate, then m4a/mp4/webm.
+
+    With ``audio_only`` no video is picked, unless the post has no separate
+    audio stream at all (the video is then the only way to get the sound).
+
+    Each format is reduced to one sort key once, and ``select`` picks both
+    streams in a single pass. Subclass and override ``video_key``/``audio_key``
+    to change the ranking.
+    """
+
+    def __init__(self, max_height: Optional[int] = DEFAULT_MAX_HEIGHT, audio_only: bool = False):
+        self.max_height = max_height
+        self.audio_only = audio_only
+
+    @classmethod
+    def from_label(cls, quality: Optional[str], audio_only: bool = False) -> "QualityPolicy":
+        """Build a policy from the UI's quality label ("1080p", "480p", "Cao nhất", ...)."""
+        m = _HEIGHT_RE.search(quality or "")
+        return cls(int(m.group(1)) if m else DEFAULT_MAX_HEIGHT, audio_only)
+
+    def video_key(self, media: Media) -> Tuple:
+        height = parse_height(media) or -1
+        fits = self.max_height is None or height <= self.max_height
+        return (
+            fits,
+            height if fits else -height,
+            -_VIDEO_EXT_RANK.get((media.get("ext") or "").lower(), 1),
+            parse_bitrate(media),
+            media.get("fps") or 0,
+        )
+
+    def audio_key(self, media: Media) -> Tuple:
+        return (
+            parse_bitrate(media),
+            -_AUDIO_EXT_RANK.get((media.get("ext") or "").lower(), 99),
+        )
+
+    def select(self, medias) -> Tuple[Optional[Media], Optional[Media]]:
+        """Return the best ``(video, audio)`` among ``medias`` (either may be None)."""
+        best_video = best_audio = None
+        video_key = audio_key = None
+        for media in medias:
+            kind = media.get("type")
+            if kind == "video":
+                key = self.video_key(media)
+                if video_key is None or key > video_key:
+                    best_video, video_key = media, key
+            elif kind == "audio":
+                key = self.audio_key(media)
+                if audio_key is None or key > audio_key:
+                    best_audio, audio_key = media, key
+        if self.audio_only and best_audio is not None:
+            return None, best_audio
+        return best_video, best_audio
@@ -0,0 +1,88 @@
+import asyncio
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+# Requests per second and burst size, keyed by host suffix. A rule covers the
+# host and all its subdomains and they share one bucket. Hosts without a rule
+# are not limited.
+HOST_RATE_LIMITS: Dict[str, Tuple[float, int]] = {
+    # Resolution / listing APIs (the only pacing channel listings get)
+    "fsmvid.com": (4.0, 8),
+    "douyin.com": (2.0, 4),
+    "tiktok.com": (2.0, 4),
+    # Media CDNs (each range segment is one request)
+    "douyinvod.com": (10.0, 20),
+    "tiktokcdn.com": (10.0, 20),
+    "tiktokcdn-us.com": (10.0, 20),
+    "googlevideo.com": (20.0, 40),
+    "fbcdn.net": (10.0, 20),
+}
+
+
+class TokenBucket:
+    """Thread-safe token bucket usable from any event loop.
+
+    ``acquire`` reserves a token immediately (the balance may go negative) and
+    then sleeps until that reservation is covered, so waiters are served in
+    arrival order without holding a lock across the sleep.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Take ``tokens`` and return how many seconds the caller must wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    async def acquire(self, tokens: float = 1.0):
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class RateLimiter:
+    """Token buckets keyed by host, shared by every outbound request path."""
+
+    def __init__(self, limits: Optional[Dict[str, Tuple[float, int]]] = None):
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, TokenBucket] = {}
+        for host, (rate, burst) in (limits if limits is not None else HOST_RATE_LIMITS).items():
+            self.configure(host, rate, burst)
+
+    def configure(self, host: str, rate: float, burst: int):
+        """Set (or replace) the rate and burst for ``host`` and its subdomains."""
+        with self._lock:
+            self._buckets[host.lower()] = TokenBucket(rate, burst)
+
+    def bucket_for(self, url: str) -> Optional[TokenBucket]:
+        """Return the bucket for the most specific rule matching ``url``'s host."""
+        host = urlsplit(url).hostname if "://" in url else url
+        if not host:
+            return None
+        labels = host.lower().split(".")
+        for i in range(len(labels) - 1):
+            bucket = self._buckets.get(".".join(labels[i:]))
+            if bucket is not None:
+                return bucket
+        return None
+
+    async def acquire(self, url: str):
+        """Wait until a request to ``url`` is allowed. Unlisted hosts pass straight through."""
+        bucket = self.bucket_for(url)
+        if bucket is not None:
+            await bucket.acquire()
+
+
+# Process-wide limiter shared by FSMVIDDown, BaseCrawler and MediaClient
+rate_limiter = RateLimiter()
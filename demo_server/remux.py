@@ -0,0 +1,94 @@
+import asyncio
+import os
+import shutil
+from pathlib import Path
+from typing import List, Optional
+
+# ffmpeg processes running at once (muxing is CPU/disk bound; stay under the core count)
+REMUX_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+# Audio codec used when the source audio cannot be stream-copied into mp4
+REMUX_FALLBACK_AUDIO = ["-c:a", "aac", "-b:a", "192k"]
+
+
+class RemuxError(Exception):
+    """ffmpeg failed to merge the streams."""
+
+
+class RemuxPool:
+    """Bounded pool of ffmpeg processes that merge separate video/audio files.
+
+    Streams are copied as-is (``-c copy``); only if ffmpeg rejects the audio
+    codec for mp4 is the audio re-encoded, the video never is. ffmpeg runs as
+    a child process awaited from the event loop, so muxing never blocks network
+    I/O, and ``workers`` caps how many run at once.
+    """
+
+    def __init__(self, ffmpeg_path: Optional[str] = None, workers: int = REMUX_WORKERS):
+        self.ffmpeg_path = self._find_ffmpeg(ffmpeg_path)
+        self.workers = workers
+        self._slots = asyncio.Semaphore(workers)
+
+    @staticmethod
+    def _find_ffmpeg(ffmpeg_path: Optional[str]) -> Optional[str]:
+        if ffmpeg_path and os.path.exists(ffmpeg_path):
+            return ffmpeg_path
+        return shutil.which("ffmpeg")
+
+    @property
+    def available(self) -> bool:
+        return self.ffmpeg_path is not None
+
+    def _command(self, video: Path, audio: Path, output: Path, audio_args: List[str]) -> List[str]:
+        return [
+            self.ffmpeg_path, "-hide_banner", "-loglevel", "error", "-nostdin", "-y",
+            "-i", str(video), "-i", str(audio),
+            "-map", "0:v:0", "-map", "1:a:0",
+            "-c:v", "copy", *audio_args,
+            "-movflags", "+faststart",
+            "-f", "mp4", str(output),
+        ]
+
+    async def _run(self, cmd: List[str]) -> str:
+        """Run ffmpeg and return its stderr; raise RemuxError on failure."""
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            _, stderr = await proc.communicate()
+        except asyncio.CancelledError:
+            proc.kill()
+            await proc.wait()
+            raise
+        message = stderr.decode("utf-8", "replace").strip()
+        if proc.returncode != 0:
+            raise RemuxError(message or f"ffmpeg exited with {proc.returncode}")
+        return message
+
+    async def remux(self, video: Path, audio: Path, output: Path, keep_inputs: bool = False) -> Path:
+        """Merge ``video`` and ``audio`` into ``output`` (mp4) and return it.
+
+        The output is written to a temporary name and renamed into place, and
+        the inputs are deleted afterwards unless ``keep_inputs`` is set.
+        """
+        if not self.available:
+            raise RemuxError("ffmpeg not found")
+        output = Path(output)
+        tmp_output = output.with_name(output.name + ".remux")
+        async with self._slots:
+            try:
+                try:
+                    await self._run(self._command(video, audio, tmp_output, ["-c:a", "copy"]))
+                except RemuxError:
+                    # Audio codec not allowed in mp4 (e.g. vorbis): re-encode the audio only
+                    await self._run(self._command(video, audio, tmp_output, REMUX_FALLBACK_AUDIO))
+                os.replace(tmp_output, output)
+            finally:
+                if tmp_output.exists():
+                    tmp_output.unlink()
+        if not keep_inputs:
+            for path in (video, audio):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        return output
@@ -0,0 +1,205 @@
+import copy
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+# Resolved entries kept in memory
+RESOLVE_CACHE_SIZE = 2048
+# Resolved entries kept on disk, and puts between prunes of the disk tier
+RESOLVE_DISK_CACHE_SIZE = 8192
+RESOLVE_PRUNE_EVERY = 256
+# TTL when no media URL carries an expiry
+RESOLVE_DEFAULT_TTL = 10 * 60
+RESOLVE_MAX_TTL = 6 * 3600
+# Drop entries this many seconds before their signed URLs expire
+RESOLVE_EXPIRY_MARGIN = 120
+
+_YOUTUBE_ID_RE = re.compile(r"(?:youtu\.be/|/shorts/|/embed/|/live/|[?&]v=)([\w-]{11})")
+_TRACKING_PARAMS = {"si", "feature", "is_from_webapp", "sender_device", "share_app_id", "share_link_id", "mibextid"}
+_EXPIRY_PARAMS = ("expire", "expires", "x-expires")
+
+
+def canonical_url(platform: str, url: str) -> str:
+    """Normalise a post URL so share-link variants map to the same cache key."""
+    if platform == "youtube":
+        m = _YOUTUBE_ID_RE.search(url)
+        if m:
+            return f"youtube.com/watch?v={m.group(1)}"
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    for prefix in ("www.", "m."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query)
+        if k not in _TRACKING_PARAMS and not k.startswith("utm_")
+    )
+    canonical = f"{host}{parts.path.rstrip('/')}"
+    return f"{canonical}?{urlencode(query)}" if query else canonical
+
+
+def url_expiry(url: str) -> Optional[float]:
+    """Return the unix time a signed CDN URL expires at, if it says."""
+    params = {k.lower(): v for k, v in parse_qsl(urlsplit(url).query)}
+    for key in _EXPIRY_PARAMS:
+        value = params.get(key)
+        if value and value.isdigit():
+            return float(value)
+    # Facebook CDN: hex timestamp in ``oe``
+    value = params.get("oe")
+    if value:
+        try:
+            return float(int(value, 16))
+        except ValueError:
+            pass
+    return None
+
+
+class ResolveCache:
+    """Cache of FSMVID resolution results keyed by (platform, canonical URL).
+
+    Entries live until shortly before the earliest signed media URL in them
+    expires. Memory holds at most ``max_entries`` (LRU); if ``cache_dir`` is
+    set, entries are also written there as JSON so they survive restarts.
+
+    The disk tier holds at most ``max_disk_entries``. Each file's mtime is set
+    to its expiry, so pruning only stats files; it runs on a background
+    thread at startup and every ``RESOLVE_PRUNE_EVERY`` puts, never on the
+    caller's event loop.
+    """
+
+    def __init__(
+            self,
+            max_entries: int = RESOLVE_CACHE_SIZE,
+            cache_dir: Optional[Path] = None,
+            max_disk_entries: int = RESOLVE_DISK_CACHE_SIZE,
+    ):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts = 0
+        self._pruning = False
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._start_prune()
+
+    @staticmethod
+    def expires_at(result: Dict[str, Any], now: float) -> float:
+        """Work out when a resolved result stops being usable."""
+        expiries = [url_expiry(m.get("url") or "") for m in result.get("medias", [])]
+        expiries = [e for e in expiries if e is not None]
+        if not expiries:
+            return now + RESOLVE_DEFAULT_TTL
+        return min(min(expiries) - RESOLVE_EXPIRY_MARGIN, now + RESOLVE_MAX_TTL)
+
+    def _disk_path(self, key: Tuple[str, str]) -> Path:
+        digest = hashlib.sha1("\n".join(key).encode("utf-8")).hexdigest()
+        return self.cache_dir / f"{digest}.json"
+
+    def get(self, platform: str, url: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached result, or None if missing or expired."""
+        key = (platform, canonical_url(platform, url))
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    return copy.deepcopy(entry[1])
+                del self._entries[key]
+        if self.cache_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("expires_at", 0) <= now:
+            self._remove_file(path)
+            return None
+        with self._lock:
+            self._remember(key, data["expires_at"], data["result"])
+        return copy.deepcopy(data["result"])
+
+    def put(self, platform: str, url: str, result: Dict[str, Any]):
+        key = (platform, canonical_url(platform, url))
+        now = time.time()
+        expires_at = self.expires_at(result, now)
+        if expires_at <= now:
+            return
+        result = copy.deepcopy(result)
+        with self._lock:
+            self._remember(key, expires_at, result)
+            self._puts += 1
+            prune = self._puts % RESOLVE_PRUNE_EVERY == 0
+        if self.cache_dir is None:
+            return
+        path = self._disk_path(key)
+        tmp_path = path.with_suffix(".tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"key": list(key), "expires_at": expires_at, "result": result}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            os.utime(path, (expires_at, expires_at))
+        except OSError:
+            return
+        if prune:
+            self._start_prune()
+
+    def _remember(self, key: Tuple[str, str], expires_at: float, result: Dict[str, Any]):
+        self._entries[key] = (expires_at, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _start_prune(self):
+        """Prune the disk tier on a background thread (one at a time)."""
+        with self._lock:
+            if self._pruning:
+                return
+            self._pruning = True
+        threading.Thread(target=self._prune_disk, name="resolve-cache-prune", daemon=True).start()
+
+    def _prune_disk(self):
+        """Delete expired entries from the disk tier, then the soonest to expire past the size limit."""
+        try:
+            now = time.time()
+            live = []
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if not entry.name.endswith(".json"):
+                        continue
+                    try:
+                        expires_at = entry.stat().st_mtime
+                    except OSError:
+                        continue
+                    if expires_at <= now:
+                        self._remove_file(entry.path)
+                    else:
+                        live.append((expires_at, entry.path))
+            if len(live) > self.max_disk_entries:
+                live.sort()
+                for _, path in live[:len(live) - self.max_disk_entries]:
+                    self._remove_file(path)
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                self._pruning = False
+
+    @staticmethod
+    def _remove_file(path: Path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,368 @@
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import httpx
+
+from media_client import MediaClient
+from progress_bus import ItemProgress
+
+# Number of concurrent byte ranges per file
+DOWNLOAD_SEGMENTS = 4
+# Files smaller than this are fetched through a single connection
+SEGMENT_MIN_SIZE = 8 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+SEGMENT_RETRIES = 3
+# Seconds between journal writes while a download is in progress
+JOURNAL_FLUSH_INTERVAL = 2.0
+
+_CONTENT_RANGE_RE = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+)")
+
+
+def _content_range_total(response: httpx.Response) -> Optional[int]:
+    """Return the full size advertised by a 206 ``Content-Range`` header."""
+    m = _CONTENT_RANGE_RE.match(response.headers.get("content-range", ""))
+    return int(m.group(3)) if m else None
+
+
+def split_ranges(start: int, end: int, parts: int) -> List[Tuple[int, int]]:
+    """Split the inclusive byte range ``start..end`` into ``parts`` contiguous ranges."""
+    length = end - start + 1
+    step = -(-length // parts)
+    return [(s, min(s + step, end + 1) - 1) for s in range(start, end + 1, step)]
+
+
+class DownloadJournal:
+    """Sidecar JSON journal recording which byte ranges of a ``.part`` file are complete.
+
+    Alongside the URL it keeps the expected size and the ``ETag``/``Last-Modified``
+    validators, so a later attempt (new signed URL, same file) can tell whether the
+    partial bytes on disk still belong to the remote file before resuming.
+    """
+
+    def __init__(self, path: Path, flush_interval: float = JOURNAL_FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.url: Optional[str] = None
+        self.size: Optional[int] = None
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.completed: List[List[int]] = []
+        self._last_flush = 0.0
+
+    def load(self) -> bool:
+        """Load the journal from disk. Return False if it is missing or unreadable."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.url = data.get("url")
+            self.size = int(data["size"])
+            self.etag = data.get("etag")
+            self.last_modified = data.get("last_modified")
+            self.completed = [[int(s), int(e)] for s, e in data.get("completed", [])]
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+        return True
+
+    def start(self, url: str, size: int, etag: Optional[str], last_modified: Optional[str]):
+        """Begin a fresh journal for a new ``.part`` file."""
+        self.url, self.size, self.etag, self.last_modified = url, size, etag, last_modified
+        self.completed = []
+        self.save()
+
+    def matches(self, size: int, etag: Optional[str], last_modified: Optional[str]) -> bool:
+        """Return True if the remote file still looks like the one journalled."""
+        if size != self.size:
+            return False
+        if etag and self.etag and etag != self.etag:
+            return False
+        if last_modified and self.last_modified and last_modified != self.last_modified:
+            return False
+        return True
+
+    def add(self, start: int, end: int):
+        """Mark the inclusive range ``start..end`` complete, flushing at most every interval."""
+        merged = []
+        for s, e in sorted(self.completed + [[start, end]]):
+            if merged and s <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], e)
+            else:
+                merged.append([s, e])
+        self.completed = merged
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.save()
+
+    def missing(self) -> List[Tuple[int, int]]:
+        """Return the inclusive byte ranges not yet downloaded."""
+        gaps, pos = [], 0
+        for s, e in self.completed:
+            if s > pos:
+                gaps.append((pos, s - 1))
+            pos = max(pos, e + 1)
+        if self.size is not None and pos < self.size:
+            gaps.append((pos, self.size - 1))
+        return gaps
+
+    def save(self):
+        if self.size is None:
+            return
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "url": self.url,
+                "size": self.size,
+                "etag": self.etag,
+                "last_modified": self.last_modified,
+                "completed": self.completed,
+            }, f)
+        os.replace(tmp_path, self.path)
+        self._last_flush = time.monotonic()
+
+    def remove(self):
+        self.size = None
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class _RangeFile:
+    """File opened for positional writes from several concurrent segments.
+
+    Writes run on worker threads (``write``). A thread cannot be interrupted,
+    so a cancelled writer leaves its write running; ``close`` therefore waits
+    for in-flight writes before releasing the fd, which could otherwise be
+    reused by another file while a write is still aimed at it.
+    """
+
+    def __init__(self, path: Path, truncate: bool = True):
+        flags = os.O_WRONLY | os.O_CREAT | getattr(os, "O_BINARY", 0)
+        if truncate:
+            flags |= os.O_TRUNC
+        self.fd = os.open(path, flags, 0o644)
+        # Windows has no pwrite; fall back to seek + write under a lock
+        self._lock = None if hasattr(os, "pwrite") else threading.Lock()
+        self._writes: "set[asyncio.Future]" = set()
+
+    def preallocate(self, size: int):
+        if os.fstat(self.fd).st_size != size:
+            os.ftruncate(self.fd, size)
+
+    def write_at(self, data: bytes, offset: int):
+        view = memoryview(data)
+        if self._lock is None:
+            while view:
+                written = os.pwrite(self.fd, view, offset)
+                view = view[written:]
+                offset += written
+            return
+        with self._lock:
+            os.lseek(self.fd, offset, os.SEEK_SET)
+            while view:
+                written = os.write(self.fd, view)
+                view = view[written:]
+
+    async def write(self, data: bytes, offset: int):
+        """Write ``data`` at ``offset`` on a worker thread."""
+        write = asyncio.ensure_future(asyncio.to_thread(self.write_at, data, offset))
+        self._writes.add(write)
+        write.add_done_callback(self._writes.discard)
+        # Cancelling the caller must not cancel the tracked write: it finishes
+        # on its thread either way, and close() waits for it
+        await asyncio.shield(write)
+
+    def close(self):
+        """Close the fd now, or as soon as the writes still running finish."""
+        if not self._writes:
+            os.close(self.fd)
+            return
+        pending = asyncio.gather(*self._writes, return_exceptions=True)
+        pending.add_done_callback(lambda _: os.close(self.fd))
+
+
+class SegmentedDownloader:
+    """Download a media URL over several concurrent byte-range connections.
+
+    The first request asks for ``bytes=0-<SEGMENT_MIN_SIZE-1>`` and doubles as the
+    probe: a ``206`` with a ``Content-Range`` total means ranges are supported, so
+    the file is preallocated and the remaining bytes are split across up to
+    ``segments`` connections written in place at their offsets. Any other answer
+    (``200``, no total) falls back to streaming the body through that single
+    connection.
+
+    Bytes land in ``<file>.part`` next to a :class:`DownloadJournal`
+    (``<file>.part.json``); the ``.part`` file is renamed into place once complete.
+    If a download is cancelled or the process dies, the next attempt for the same
+    path validates the journal and only requests the missing ranges.
+
+    ``progress`` (an :class:`~progress_bus.ItemProgress`) is told the file size
+    once known and every chunk written. To stop a download, cancel the task
+    running it; the journal keeps what was written for the next attempt.
+    """
+
+    def __init__(
+            self,
+            client: MediaClient,
+            segments: int = DOWNLOAD_SEGMENTS,
+            min_segment_size: int = SEGMENT_MIN_SIZE,
+            chunk_size: int = CHUNK_SIZE,
+            retries: int = SEGMENT_RETRIES,
+            progress: Optional[ItemProgress] = None,
+    ):
+        self.client = client
+        self.segments = max(1, segments)
+        self.min_segment_size = min_segment_size
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.progress = progress
+
+    async def download(self, url: str, filepath: Path):
+        """Download ``url`` into ``filepath``; raises if it cannot be completed."""
+        filepath = Path(filepath)
+        part_path = filepath.with_name(filepath.name + ".part")
+        journal = DownloadJournal(filepath.with_name(filepath.name + ".part.json"))
+
+        if not (part_path.exists() and journal.load() and await self._resume(url, part_path, journal)):
+            await self._fresh(url, part_path, journal)
+        os.replace(part_path, filepath)
+        journal.remove()
+
+    async def _fresh(self, url: str, part_path: Path, journal: DownloadJournal):
+        """Start a download from byte zero into a new ``.part`` file."""
+        journal.remove()
+        out = _RangeFile(part_path)
+        tasks: List[asyncio.Future] = []
+        try:
+            first_end = self.min_segment_size - 1
+            headers = {"Range": f"bytes=0-{first_end}"} if self.segments > 1 else {}
+            async with self.client.stream("GET", url, headers=headers) as response:
+                response.raise_for_status()
+                total = _content_range_total(response) if response.status_code == 206 else None
+                if total is None:
+                    # Ranges not supported: the body is the whole file
+                    length = response.headers.get("content-length")
+                    if self.progress is not None and length and length.isdigit():
+                        self.progress.add_total(int(length))
+                    await self._write_body(response, out, 0)
+                    return
+
+                journal.start(url, total, response.headers.get("etag"), response.headers.get("last-modified"))
+                if self.progress is not None:
+                    self.progress.add_total(total)
+                out.preallocate(total)
+                first_end = min(first_end, total - 1)
+                if first_end + 1 < total:
+                    parts = min(self.segments - 1, -(-(total - first_end - 1) // self.min_segment_size)) or 1
+                    ranges = split_ranges(first_end + 1, total - 1, parts)
+                    tasks.append(asyncio.ensure_future(self._fetch_ranges(url, out, ranges, parts, journal)))
+                written = await self._write_body(response, out, 0, journal)
+
+            if written < first_end + 1:
+                # First connection dropped early; resume it as a plain range
+                await self._fetch_range(url, out, written, first_end, journal)
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            out.close()
+            journal.save()
+
+    async def _resume(self, url: str, part_path: Path, journal: DownloadJournal) -> bool:
+        """Fetch only the ranges missing from ``part_path``. Return False if the journal is stale."""
+        async with self.client.stream("GET", url, headers={"Range": "bytes=0-0"}) as response:
+            response.raise_for_status()
+            total = _content_range_total(response) if response.status_code == 206 else None
+            etag, last_modified = response.headers.get("etag"), response.headers.get("last-modified")
+        if total is None or not journal.matches(total, etag, last_modified):
+            return False
+
+        journal.url = url
+        ranges = []
+        missing = journal.missing()
+        if self.progress is not None:
+            self.progress.add_total(total)
+            self.progress.add(total - sum(end - start + 1 for start, end in missing))
+        for start, end in missing:
+            parts = max(1, min(self.segments, -(-(end - start + 1) // self.min_segment_size)))
+            ranges.extend(split_ranges(start, end, parts))
+        out = _RangeFile(part_path, truncate=False)
+        try:
+            out.preallocate(total)
+            await self._fetch_ranges(url, out, ranges, self.segments, journal)
+            return True
+        finally:
+            out.close()
+            journal.save()
+
+    async def _fetch_ranges(
+            self,
+            url: str,
+            out: _RangeFile,
+            ranges: List[Tuple[int, int]],
+            connections: int,
+            journal: DownloadJournal,
+    ):
+        """Fetch ``ranges`` with at most ``connections`` of them in flight."""
+        slots = asyncio.Semaphore(max(1, connections))
+
+        async def fetch(start: int, end: int):
+            async with slots:
+                await self._fetch_range(url, out, start, end, journal)
+
+        tasks = [asyncio.ensure_future(fetch(start, end)) for start, end in ranges]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _write_body(
+            self,
+            response: httpx.Response,
+            out: _RangeFile,
+            offset: int,
+            journal: Optional[DownloadJournal] = None,
+    ) -> int:
+        """Write a response body at ``offset``. Return bytes written."""
+        written = 0
+        try:
+            async for chunk in response.aiter_bytes(chunk_size=self.chunk_size):
+                await out.write(chunk, offset + written)
+                if journal is not None:
+                    journal.add(offset + written, offset + written + len(chunk) - 1)
+                if self.progress is not None:
+                    self.progress.add(len(chunk))
+                written += len(chunk)
+        except httpx.TransportError:
+            if response.status_code != 206:
+                raise
+        return written
+
+    async def _fetch_range(
+            self,
+            url: str,
+            out: _RangeFile,
+            start: int,
+            end: int,
+            journal: Optional[DownloadJournal] = None,
+    ):
+        """Fetch the inclusive byte range ``start..end``, resuming after dropped connections."""
+        attempt = 0
+        while start <= end:
+            async with self.client.stream("GET", url, headers={"Range": f"bytes={start}-{end}"}) as response:
+                response.raise_for_status()
+                if response.status_code != 206:
+                    raise httpx.HTTPError(f"Server ignored Range request for {url}")
+                written = await self._write_body(response, out, start, journal)
+            start += written
+            if start <= end:
+                attempt += 1
+                if attempt > self.retries:
+                    raise httpx.HTTPError(f"Segment {start}-{end} of {url} failed after {self.retries} retries")
@@ -1 +1 @@
-from .yt_downloader import YouTubeDownloader
+from .yt_downloader import YouTubeDownloader, YTDLP_ERROR_PREFIX
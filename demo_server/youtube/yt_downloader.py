@@ -3,6 +3,12 @@ import sys
 import json
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from yt_dlp import YoutubeDL
+from yt_dlp.utils import DownloadCancelled
+
+# Default height cap for downloads
+DEFAULT_MAX_HEIGHT = 1080
+# Start of the string download_worker returns when a download failed
+YTDLP_ERROR_PREFIX = "❌ ERROR"
 # sys.stdout.reconfigure(encoding="utf-8")
 
 class YouTubeDownloader:
@@ -59,17 +65,29 @@ class YouTubeDownloader:
             "ignoreerrors": True,
         }
 
-    def get_download_options(self):
+    @staticmethod
+    def get_format(max_height=DEFAULT_MAX_HEIGHT):
+        """Format selector: best streams up to ``max_height``, else the smallest above it."""
+        if max_height is None:
+            return "bv*+ba/b"
+        return f"bv*[height<={max_height}]+ba/b[height<={max_height}]/wv*+ba/w"
+
+    def get_download_options(self, max_height=DEFAULT_MAX_HEIGHT, audio_only=False, output_dir=None):
         opts = {
-            "format": "bv*[height<=1080]+ba/best",
-            "outtmpl": os.path.join(self.output_dir, "%(title)s [%(id)s].%(ext)s"),
+            "format": self.get_format(max_height),
+            "outtmpl": os.path.join(output_dir or self.output_dir, "%(title)s [%(id)s].%(ext)s"),
+            # ffmpeg chỉ ghép stream (-c copy), không encode lại audio
             "merge_output_format": "mp4",
-            "postprocessor_args": ["-c:a", "aac", "-b:a", "192k"],
             "ignoreerrors": True,
             "retries": 3,
             "quiet": True,
+            "noprogress": True,
             "no_warnings": True,
         }
+        if audio_only:
+            # Chỉ lấy audio gốc: không merge, không encode lại
+            opts["format"] = "ba/b"
+            del opts["merge_output_format"]
         
         ffmpeg_loc = self._get_ffmpeg_path()
         if ffmpeg_loc:
@@ -114,14 +132,32 @@ class YouTubeDownloader:
         
         return video_urls
 
-    def download_worker(self, url: str):
-        opts = self.get_download_options()
+    def download_worker(self, url: str, max_height=DEFAULT_MAX_HEIGHT, audio_only=False,
+                        output_dir=None, on_progress=None, cancel_event=None):
+        """Download one video (blocking).
+
+        ``on_progress`` receives yt-dlp's progress dicts. Setting ``cancel_event``
+        stops the download at its next progress tick by raising
+        ``DownloadCancelled`` out of this call.
+        """
+        opts = self.get_download_options(max_height, audio_only, output_dir)
+        if on_progress is not None or cancel_event is not None:
+            def hook(d):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise DownloadCancelled(f"Cancelled: {url}")
+                if on_progress is not None:
+                    on_progress(d)
+            opts["progress_hooks"] = [hook]
         try:
             with YoutubeDL(opts) as ydl:
-                ydl.download([url])
+                # ignoreerrors makes yt-dlp report failures through its return code
+                if ydl.download([url]):
+                    return f"{YTDLP_ERROR_PREFIX}: {url} -> yt-dlp could not download this video"
             return f"✅ DONE: {url}"
+        except DownloadCancelled:
+            raise
         except Exception as e:
-            return f"❌ ERROR: {url} -> {e}"
+            return f"{YTDLP_ERROR_PREFIX}: {url} -> {e}"
 
     def download_from_list(self, video_list: list[str]):
         total_videos = len(video_list)